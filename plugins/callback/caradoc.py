@@ -3,19 +3,40 @@
 
 from __future__ import absolute_import, division, print_function
 
+import argparse
+import contextlib
+import copy
+import gzip
+import hashlib
+import heapq
+import itertools
+import json
 import logging
+import multiprocessing
 import os
+import queue
 import re
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
 import time
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
 
 from ansible.module_utils._text import to_bytes, to_native, to_text
+from ansible.module_utils.common.json import AnsibleJSONEncoder
 from ansible.plugins.callback import CallbackBase
 from ansible.template import Templar
 from ansible.template.vars import AnsibleJ2Vars
 from ansible.utils.display import Display
 from ansible.utils.path import makedirs_safe
 from ansible.utils.unsafe_proxy import wrap_var
-from ansible.vars.clean import module_response_deepcopy, strip_internal_keys
+from jinja2.bccache import FileSystemBytecodeCache
 from jinja2.exceptions import TemplateSyntaxError, UndefinedError
 from jinja2.utils import concat as j2_concat
 
@@ -30,6 +51,7 @@ from ansible.errors import (  # noqa: F401
 )
 
 import ansible
+import jinja2
 from distutils.version import LooseVersion
 
 # Ansible CLI options are now in ansible.context in >= 2.8
@@ -53,6 +75,192 @@ options:
         ini:
             - section: callback_log_plays
               key: log_folder
+    async_mode:
+        default: false
+        type: bool
+        description:
+          - Render and write report files from a background writer thread, so Ansible does not wait for Caradoc on each result.
+          - Pending writes are flushed when the playbook ends.
+        env:
+            - name: CARADOC_ASYNC
+        ini:
+            - section: callback_caradoc
+              key: async_mode
+    async_queue_size:
+        default: 1000
+        type: int
+        description: Maximum number of pending writes when O(async_mode) is enabled.
+        env:
+            - name: CARADOC_ASYNC_QUEUE_SIZE
+        ini:
+            - section: callback_caradoc
+              key: async_queue_size
+    async_queue_policy:
+        default: block
+        choices: [block, drop]
+        description:
+          - What to do when the writer queue is full.
+          - C(block) waits for the writer thread.
+          - C(drop) skips page updates (host results are never dropped), latest skipped pages are written when the playbook ends.
+        env:
+            - name: CARADOC_ASYNC_QUEUE_POLICY
+        ini:
+            - section: callback_caradoc
+              key: async_queue_policy
+    run_refresh_interval:
+        default: 2.0
+        type: float
+        description:
+          - Minimum delay in seconds between two renders of the run README and charts while the playbook runs.
+          - Updates in between are coalesced, run pages are always rendered on play start and when the playbook ends.
+          - Set to 0 to render run pages on every update.
+        env:
+            - name: CARADOC_RUN_REFRESH_INTERVAL
+        ini:
+            - section: callback_caradoc
+              key: run_refresh_interval
+    latest_tasks_size:
+        default: 20
+        type: int
+        description: Number of latest tasks listed on the run README.
+        env:
+            - name: CARADOC_LATEST_TASKS_SIZE
+        ini:
+            - section: callback_caradoc
+              key: latest_tasks_size
+    bytecode_cache:
+        default: true
+        type: bool
+        description:
+          - Keep compiled templates in a C(.caradoc.cache) folder of O(log_folder), so templates are only compiled once and not on every run.
+          - Cached entries are checked against template source and Jinja bytecode version, a stale entry is compiled again.
+        env:
+            - name: CARADOC_BYTECODE_CACHE
+        ini:
+            - section: callback_caradoc
+              key: bytecode_cache
+    renderer:
+        default: jinja
+        choices: [jinja, native]
+        description:
+          - Engine used for the most often rendered files, task README and run README.
+          - C(native) builds them with plain Python string operations, output is identical to the Jinja templates.
+          - Other pages are always rendered with Jinja.
+        env:
+            - name: CARADOC_RENDERER
+        ini:
+            - section: callback_caradoc
+              key: renderer
+    result_max_field_size:
+        default: 0
+        type: int
+        description:
+          - Maximum size, in characters, of a string or list of strings field of a host result, like C(stdout) or C(stdout_lines), at top level or in loop items of C(results). 0 means no limit.
+          - Bigger fields are truncated in C(<host>.json) with a marker and their full value is written to a compressed C(<host>.<field>.gz) file, or C(<host>.results.<item>.<field>.gz) for loop items, linked from the task README.
+        env:
+            - name: CARADOC_RESULT_MAX_FIELD_SIZE
+        ini:
+            - section: callback_caradoc
+              key: result_max_field_size
+    result_max_file_size:
+        default: 0
+        type: int
+        description:
+          - Maximum size, in characters, of all string or list of strings fields of a host result, at top level or in loop items of C(results). 0 means no limit.
+          - When exceeded, largest fields are truncated and spilled as with O(result_max_field_size) until the result fits.
+          - Other values, like dicts of facts, are not truncated and do not count in this size.
+          - Truncated fields keep their first O(result_max_field_size) characters, or 4096 when it is not set.
+        env:
+            - name: CARADOC_RESULT_MAX_FILE_SIZE
+        ini:
+            - section: callback_caradoc
+              key: result_max_file_size
+    result_backend:
+        default: files
+        choices: [files, sqlite]
+        description:
+          - Where host results are stored.
+          - C(files) writes one C(<host>.json) file per task and host, next to the task README.
+          - C(sqlite) stores compressed host results and truncated fields in a single C(results.sqlite) file of the run folder, only adoc pages remain as files.
+            Run C(python caradoc.py export <run folder>) to write them back as files.
+          - The SQLite file uses the default rollback journal, it can be written to a network filesystem.
+        env:
+            - name: CARADOC_RESULT_BACKEND
+        ini:
+            - section: callback_caradoc
+              key: result_backend
+    record_only:
+        default: false
+        type: bool
+        description:
+          - Only write host results and the event log while the playbook runs, no page is rendered.
+          - Render pages later with C(python caradoc.py render <run folder>), for example on another host.
+        env:
+            - name: CARADOC_RECORD_ONLY
+        ini:
+            - section: callback_caradoc
+              key: record_only
+    low_memory:
+        default: false
+        type: bool
+        description:
+          - Keep less data in memory for tasks of current play.
+          - Diffs are written to C(<host>.diff) files of the task folder as soon as they are received, and included by the task README.
+          - Host entries of finished tasks that only hold a status are replaced by one shared entry per status.
+        env:
+            - name: CARADOC_LOW_MEMORY
+        ini:
+            - section: callback_caradoc
+              key: low_memory
+    event_log:
+        default: true
+        type: bool
+        description:
+          - Append every tracked callback as one JSON line to C(events.jsonl) of the run folder.
+          - Pages can be rendered again from this log with C(python caradoc.py render <run folder>), even for a run that was killed.
+          - Always enabled with O(record_only).
+        env:
+            - name: CARADOC_EVENT_LOG
+        ini:
+            - section: callback_caradoc
+              key: event_log
+    profile:
+        default: false
+        type: bool
+        description:
+          - Measure Caradoc own overhead, wall and CPU time of each callback method, template render and file write.
+          - Results are written to C(caradoc-profile.json) of the run folder and summarized on the run README when the playbook ends.
+        env:
+            - name: CARADOC_PROFILE
+        ini:
+            - section: callback_caradoc
+              key: profile
+    trace:
+        default: false
+        type: bool
+        description:
+          - Record callback calls with their arguments and time to C(trace.jsonl.gz) of the run folder.
+          - A trace is fed back to the callback by C(tests/benchmarks/replay.py), at full speed or at recorded pace.
+          - Host results are recorded in full, traces of large runs may be large.
+        env:
+            - name: CARADOC_TRACE
+        ini:
+            - section: callback_caradoc
+              key: trace
+    fsync:
+        default: never
+        choices: [never, stats, always]
+        description:
+          - Files are always written to a temporary file then renamed, so readers never see a partially written file.
+          - This option tells when written files are also flushed to disk.
+          - C(never) lets the system flush files.
+          - C(stats) flushes, when the playbook ends, every file written by the run, results SQLite file and event log included, then their folders up to the base log folder so that renames are flushed too.
+          - C(always) flushes every file and its folder as soon as it is written.
+        env:
+            - name: CARADOC_FSYNC
+        ini:
+            - section: callback_caradoc
+              key: fsync
 """
 
 # Task modules for which Caradoc should save host facts like ARA (?)
@@ -67,8 +275,39 @@ ANSIBLE_SETUP_MODULES = frozenset(
     ]
 )
 
-# Cache for templates bytecode, used by CaradocTemplar
-CARADOC_CACHE = {}
+# Streamed file contents are written by blocks of this size
+CARADOC_WRITE_BUFFER_SIZE = 64 * 1024
+
+# Characters kept from a truncated result field when only result_max_file_size is set
+CARADOC_TRUNCATED_FIELD_SIZE = 4096
+
+# Compiled templates used by CaradocTemplar, keyed by sha256 of their source. Least recently used are evicted
+CARADOC_CACHE = OrderedDict()
+CARADOC_CACHE_SIZE = 64
+
+# Full source (common macros included) and its key for each template text, see caradoc_template_source
+CARADOC_SOURCES = {}
+
+# Result statuses counted for run, plays, hosts and tasks, pages show all but unreachable
+CARADOC_STATUSES = ("changed", "ok", "failed", "skipped", "ignored_failed", "rescued", "unreachable")
+CARADOC_STATUS_IDS = {status: index for index, status in enumerate(CARADOC_STATUSES)}
+CARADOC_SHOWN_STATUSES = CARADOC_STATUSES[:-1]
+CARADOC_ZERO_COUNTERS = array("q", [0] * len(CARADOC_STATUSES))
+
+# Rows of slowest tasks and hosts tables, and tasks shown on the run timeline chart
+CARADOC_SLOWEST_SIZE = 10
+CARADOC_TIMELINE_SIZE = 1000
+
+# Width in seconds of hosts in flight and results per second buckets, and maximum points on their charts.
+#  Buckets are merged when a run has more
+CARADOC_SERIES_BUCKET = 1.0
+CARADOC_SERIES_POINTS = 2000
+
+# Shared host entries of finished tasks for low_memory option, one per status
+CARADOC_STATUS_RESULTS = {}
+
+# Templar signature changed in Ansible 2.16, checked once for all CaradocTemplar instances
+ANSIBLE_TEMPLAR_LEGACY = LooseVersion(ansible.__version__) < LooseVersion("2.16")
 
 
 class CallbackModule(CallbackBase):
@@ -81,29 +320,38 @@ class CallbackModule(CallbackBase):
     CALLBACK_NAME = "caradoc_default"
 
     TIME_FORMAT = "%b %d %Y %H:%M:%S"
-    _host_result_struct = {
-        "changed": 0,
-        "ok": 0,
-        "failed": 0,
-        "skipped": 0,
-        "ignored_failed": 0,
-        "rescued": 0,
-    }
 
     # FIXME deal with nolog (https://github.com/ansible/ansible/blob/3515b3c5fcf011ba9bb63fe069520c7d528e3c54/lib/ansible/executor/task_result.py#L131)
     def __init__(self):
         super().__init__()
         # tasks related to current play
         self.tasks = dict()
-
-        # host results tracked for all plays
+        # tasks of current play whose rows in play pages must be rendered again
+        self._dirty_tasks = set()
+        # rendered play rows per task (normal, all_mode), owned by the thread that renders
+        self._play_rows = {}
+        self._play_rows_uuid = None
+
+        # result counters of run, plays and tasks
+        self.stats = CaradocStats()
+        # host results tracked for all plays, counters are views of self.stats
         self.play_results = {
             "plays": {},
-            "host_results": {"all": self._host_result_struct.copy()},
+            "host_results": self.stats.run,
         }
 
-        # detailed latest results
-        self.latest_tasks = {}
+        # durations, in seconds from playbook start: host starts of running tasks, time spent by hosts
+        #  on tasks of the run, and start and end of tasks of the run
+        self._host_starts = {}
+        self.host_durations = {}
+        self.task_durations = {}
+        # hosts in flight and completed results over time, per play
+        self.series = {}
+
+        # detailed latest results, oldest tasks are evicted once latest_tasks_size is reached.
+        #  Counters of every task are kept in self.stats
+        self.latest_tasks = OrderedDict()
+        self.latest_tasks_size = 20
 
         # Current playbook running
         self.play = None
@@ -115,37 +363,226 @@ class CallbackModule(CallbackBase):
 
         # global task count
         self.task_end_count = 0
+
+        # Background writer, only when async_mode is enabled
+        self._writer = None
+
+        # Written files are flushed to disk when set, see fsync option
+        self._fsync_writes = False
+        # Paths written but not flushed yet, only tracked when fsync is stats
+        self._unsynced = None
+        # Mode of written files, temporary files are created with 0600 only
+        self._file_mode = 0o644
+
+        # Overhead measures, only when profile is enabled
+        self._profiler = None
+        self._profile_rows = []
+
+        # Callback calls trace, only when trace is enabled
+        self._trace = None
+
+        # Event log, only when event_log is enabled
+        self._events = None
+        self._started_at = None
+        # Pages are not rendered while false, see record_only option and render command
+        self._rendering = True
+        self._loader = None
+
+        # Host results store, only when result_backend is sqlite
+        self._results = None
+
+        # Folders known to exist, each one is only checked or created once
+        self._known_dirs = set()
+
+        # Digest of last content written per file path, and written vs skipped unchanged files
+        self._file_digests = {}
+        self.write_stats = {
+            "written_files": 0,
+            "written_bytes": 0,
+            "skipped_files": 0,
+            "skipped_bytes": 0,
+        }
+
+        # Single templar for the whole run, variables are swapped on each render
+        self._templar = None
+        self._bytecode_cache = None
+        self.renderer = "jinja"
+        self.low_memory = False
+        self.result_max_field_size = 0
+        self.result_max_file_size = 0
+
+        # Run pages are coalesced: track pending changes and last render time, a timer renders
+        #  pending changes at the end of the interval
+        self._run_dirty = False
+        self._run_saved_at = None
+        self._run_timer = None
+        # Held while state changes, the timer renders from another thread
+        self._state_lock = threading.Lock()
         self.log = logging.getLogger("caradoc.plugins.callback.default")
 
     def set_options(self, task_keys=None, var_options=None, direct=None):
         super().set_options(task_keys=task_keys, var_options=var_options, direct=direct)
 
     def v2_playbook_on_start(self, playbook):
-        self.log_folder = self.get_option("log_folder")
-        # Ensure base log folder exists
-        if not os.path.exists(self.log_folder):
-            makedirs_safe(self.log_folder)
-        if not os.path.exists(f"{self.log_folder}/.caradoc.env.adoc"):
-            # Dump default statics adoc env
-            with open(os.path.join(self.log_folder, ".caradoc.env.adoc"), "wb") as fd:
-                fd.write(to_bytes(CaradocTemplates.env))
-        if not os.path.exists(f"{self.log_folder}/.caradoc.css.adoc"):
-            with open(os.path.join(self.log_folder, ".caradoc.css.adoc"), "wb") as fd:
-                fd.write(to_bytes(CaradocTemplates.css))
+        self._setup(self.get_option("log_folder"))
 
         # Create run directory
         now = time.strftime("%Y%m%d-%H%M%S", time.localtime())
         self.log_folder = os.path.join(self.log_folder, now)
 
-        self.run_date = time.strftime("%Y/%m/%d - %H:%M:%S", time.localtime())
-        if not os.path.exists(self.log_folder):
-            makedirs_safe(self.log_folder)
+        run_date = time.strftime("%Y/%m/%d - %H:%M:%S", time.localtime())
+        self._ensure_dir(self.log_folder)
+
+        self.result_max_field_size = self.get_option("result_max_field_size")
+        self.result_max_file_size = self.get_option("result_max_file_size")
+        if self.get_option("result_backend") == "sqlite":
+            self._results = CaradocResultStore(
+                self.log_folder, "FULL" if self.get_option("fsync") == "always" else "NORMAL"
+            )
+        if self.get_option("async_mode"):
+            self._writer = CaradocWriter(
+                self.get_option("async_queue_size"),
+                self.get_option("async_queue_policy"),
+            )
+        self._rendering = not self.get_option("record_only")
+        if self.get_option("profile"):
+            self._profiler = CaradocProfiler()
+            self._profiler.instrument(self)
+        if self.get_option("event_log") or not self._rendering:
+            self._events = CaradocEventLog(os.path.join(self.log_folder, CaradocEventLog.FILENAME))
+        self._started_at = time.monotonic()
+        if self.get_option("trace"):
+            self._trace = CaradocTrace(os.path.join(self.log_folder, CaradocTrace.FILENAME), self._started_at)
+            self._trace.record("v2_playbook_on_start", (playbook,), {})
+            self._trace.instrument(self)
 
         self.log.debug("v2_playbook_on_start")
 
         self._playbook = playbook
+        self._loader = playbook.get_loader()
+        self._handle({"e": "playbook_start", "run_date": run_date})
         return
 
+    # Base log folder and rendering settings, shared by playbook runs and the render command
+    def _setup(self, log_folder):
+        self.latest_tasks_size = self.get_option("latest_tasks_size")
+        if self.latest_tasks_size < 0:
+            raise AnsibleOptionsError(
+                f"caradoc: latest_tasks_size must be 0 or more, got {self.latest_tasks_size}"
+            )
+        self.log_folder = log_folder
+        self._fsync_writes = self.get_option("fsync") == "always"
+        self._unsynced = set() if self.get_option("fsync") == "stats" else None
+        umask = os.umask(0)
+        os.umask(umask)
+        self._file_mode = 0o666 & ~umask
+
+        # Ensure base log folder exists
+        self._ensure_dir(self.log_folder)
+        if not os.path.exists(f"{self.log_folder}/.caradoc.env.adoc"):
+            # Dump default statics adoc env
+            self._save_as_file("", ".caradoc.env.adoc", CaradocTemplates.env)
+        if not os.path.exists(f"{self.log_folder}/.caradoc.css.adoc"):
+            self._save_as_file("", ".caradoc.css.adoc", CaradocTemplates.css)
+
+        if self.get_option("bytecode_cache"):
+            bytecode_folder = os.path.join(self.log_folder, ".caradoc.cache")
+            self._ensure_dir(bytecode_folder)
+            self._bytecode_cache = FileSystemBytecodeCache(bytecode_folder)
+
+        self.run_refresh_interval = self.get_option("run_refresh_interval")
+        self.renderer = self.get_option("renderer")
+        self.low_memory = self.get_option("low_memory")
+
+    # Render all pages of a run folder from its event log, pages are rendered once per play.
+    #  With several workers, plays are rendered by forked processes while events are replayed.
+    #  Returns wall time in seconds of each phase
+    def render(self, run_folder, loader, workers=1):
+        run_folder = os.path.normpath(run_folder)
+        self._setup(os.path.dirname(run_folder))
+        self.log_folder = run_folder
+        self._loader = loader
+        self._rendering = False
+
+        timings = {"events": 0.0, "plays": 0.0, "run": 0.0}
+        started = time.monotonic()
+        pool, jobs = None, []
+        if workers > 1:
+            pool = ProcessPoolExecutor(
+                workers,
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_caradoc_render_init,
+                initargs=(self,),
+            )
+
+        def render_play():
+            if pool is None:
+                play_started = time.monotonic()
+                self._render_play_pages()
+                timings["plays"] = timings["plays"] + time.monotonic() - play_started
+            else:
+                # state of a play is never changed once next play starts, no copy needed
+                host_results = self.play_results["plays"][self.play["_uuid"]]["host_results"]
+                jobs.append(pool.submit(_caradoc_render_play, self.play, self.tasks, host_results))
+
+        try:
+            with open(os.path.join(run_folder, CaradocEventLog.FILENAME), encoding="utf-8") as fd:
+                for line in fd:
+                    # last line of a killed run may be incomplete
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    if event["e"] == "play_start" and self.play is not None:
+                        render_play()
+                    self._handle(event)
+            if self.play is not None:
+                render_play()
+            timings["events"] = time.monotonic() - started - timings["plays"]
+
+            if pool is not None:
+                for job in jobs:
+                    job.result()
+                timings["plays"] = time.monotonic() - started - timings["events"]
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        run_started = time.monotonic()
+        self._rendering = True
+        self._save_run(force=True)
+        self._rendering = False
+        timings["run"] = time.monotonic() - run_started
+        return timings
+
+    # Render task READMEs and play pages of current play from its full state
+    def _render_play_pages(self):
+        self._rendering = True
+        for task in self.tasks.values():
+            self._save_task_readme(task)
+        self._dirty_tasks = set(self.tasks)
+        self._save_play()
+        self._rendering = False
+
+    # Every tracked callback is turned into an event: the event is appended to the event log,
+    #  then applied to the state by the matching _apply_<event> method which renders pages
+    def _handle(self, event):
+        if "t" not in event and self._started_at is not None:
+            event["t"] = round(time.monotonic() - self._started_at, 3)
+        with self._state_lock:
+            if self._events is not None:
+                self._events.record(event)
+            getattr(self, f"_apply_{event['e']}")(event)
+
+    # Task uuid as tracked in self.tasks, serial batches of a play get their own tasks
+    def _task_uuid(self, uuid):
+        if self.serial_count != 0:
+            return f"{uuid}-{self.serial_count}"
+        return uuid
+
+    def _apply_playbook_start(self, event):
+        self.run_date = event["run_date"]
+
     # TODO: may do something with this
     def v2_runner_retry(self, result):
         pass
@@ -153,33 +590,41 @@ class CallbackModule(CallbackBase):
     # FIXME: serial dont work: only last host play will be tracked => test uuid and act
     def v2_playbook_on_play_start(self, play):
         self.log.debug("v2_playbook_on_play_start")
+        self._handle(
+            {"e": "play_start", "uuid": play._uuid, "name": play.name, "hosts": play.hosts}
+        )
+
+    def _apply_play_start(self, event):
         # TODO: make a separate func for new_name
-        play_filename = re.sub(r"[^0-9a-zA-Z_\-.]", "_", play.name)
-        play_name = play.name
-        if play.name in self.play_names_count:
-            self.play_names_count[play.name] = self.play_names_count[play.name] + 1
-            play_filename = f"{play_name}-{str(self.play_names_count[play.name])}"
-            play_name = f"{play_name} ({str(self.play_names_count[play.name])})"
+        play_filename = re.sub(r"[^0-9a-zA-Z_\-.]", "_", event["name"])
+        play_name = event["name"]
+        if play_name in self.play_names_count:
+            self.play_names_count[play_name] = self.play_names_count[play_name] + 1
+            play_filename = f"{play_name}-{str(self.play_names_count[play_name])}"
+            play_name = f"{play_name} ({str(self.play_names_count[play_name])})"
         else:
-            self.play_names_count[play.name] = 1
+            self.play_names_count[play_name] = 1
 
         if self.play is not None:
             self._save_play()
+            if self._run_dirty:
+                self._save_run(force=True)
             # TODO: ok to loose track of tasks but may should refer plays for global stats
             self.tasks = dict()
+            self._dirty_tasks = set()
 
-        play_uuid = play._uuid
+        play_uuid = event["uuid"]
         if self.play is not None and (
-            play._uuid == self.play["_uuid"]
-            or self.play["_uuid"] == f"{play._uuid}-{self.serial_count}"
+            event["uuid"] == self.play["_uuid"]
+            or self.play["_uuid"] == f"{event['uuid']}-{self.serial_count}"
         ):
             self.serial_count = self.serial_count + 1
-            play_uuid = f"{play._uuid}-{self.serial_count}"
-        elif self.play is not None and play._uuid != self.play["_uuid"]:
+            play_uuid = f"{event['uuid']}-{self.serial_count}"
+        elif self.play is not None and event["uuid"] != self.play["_uuid"]:
             self.serial_count = 0
 
         self.play_results["plays"][play_uuid] = {
-            "host_results": {"all": self._host_result_struct.copy()},
+            "host_results": self.stats.play(play_uuid),
             "name": play_name,
             "filename": play_filename,
         }
@@ -189,8 +634,12 @@ class CallbackModule(CallbackBase):
             "filename": play_filename,
             "_uuid": play_uuid,
             "tasks": [],
-            "attributes": play.hosts,
+            "attributes": event["hosts"],
+            "host_durations": {},
         }
+        self._host_starts = {}
+        if "t" in event:
+            self.series[play_uuid] = CaradocSeries(play_name, event["t"])
         return
 
     def v2_playbook_on_handler_task_start(self, task):
@@ -200,32 +649,41 @@ class CallbackModule(CallbackBase):
 
     def v2_playbook_on_task_start(self, task, is_conditional, handler=False):
         # TODO: for task duration, see example on https://github.com/alikins/ansible/blob/devel/lib/ansible/plugins/callback/profile_tasks.py
-        has_rescue = False
-        # FIXME: if rescue does fail, then the task is tracked as rescued.
-        #  => should check if current task is in the rescue or the block in parent definition
-        if (
+        self._handle(self._task_event("task_start", task, self._has_rescue(task)))
+
+    # FIXME: if rescue does fail, then the task is tracked as rescued.
+    #  => should check if current task is in the rescue or the block in parent definition
+    @staticmethod
+    def _has_rescue(task):
+        return (
             task._parent is not None
             and hasattr(task._parent, "_ds")
             and "rescue" in task._parent._ds
-        ):
-            has_rescue = True
+        )
 
-        self._create_new_task_or_handler(task, has_rescue)
-        task_uuid = task._uuid
-        if self.serial_count != 0:
-            task_uuid = f"{task_uuid}-{self.serial_count}"
+    # Event of a task or handler start, with all task attributes rendered in pages
+    @staticmethod
+    def _task_event(name, task, has_rescue=False):
+        return {
+            "e": name,
+            "uuid": task._uuid,
+            "name": task.get_name(),
+            "action": task.action,
+            "tags": task.tags,
+            "path": task.get_path(),
+            "has_rescue": has_rescue,
+            "start_time": str(time.time()),
+        }
 
-        self._save_task_readme(self.tasks[task_uuid])
+    def _apply_task_start(self, event):
+        self._create_new_task_or_handler(event)
+        self._save_task_readme(self.tasks[self._task_uuid(event["uuid"])])
         self._save_play()
         self._save_run()
 
-        return
-
     # Check if couple of task name already referenced and managed a counter
-    def _get_new_task_name(self, task):
-        name = task.get_name()
+    def _get_new_task_name(self, name, action):
         # TODO: track resolved action
-        action = task.action
         name = "no_name" if name == "" else name
         name = name + "-" + action
 
@@ -239,9 +697,51 @@ class CallbackModule(CallbackBase):
         return name
 
     def v2_runner_on_start(self, host, task):
-        # TODO: render task list with init of running for each host + track start time
+        # TODO: render task list with init of running for each host
         self.log.debug("v2_runner_on_start")
-        return
+        self._handle({"e": "host_start", "task": task._uuid, "host": host.name})
+
+    def _apply_host_start(self, event):
+        if "t" not in event:
+            return
+        task_uuid = self._task_uuid(event["task"])
+        self._host_starts[(task_uuid, event["host"])] = event["t"]
+        self.series[self.play["_uuid"]].host_start(event["t"])
+
+        task = self.tasks.get(task_uuid)
+        if task is not None and task["started_at"] is None:
+            task["started_at"] = event["t"]
+
+    # Task ends with its last host result, time from host start to result is added to the host
+    def _track_duration(self, task, host, t, started_at):
+        if task["started_at"] is None:
+            task["started_at"] = t if started_at is None else started_at
+        task["ended_at"] = t
+        if started_at is not None:
+            host_durations = self.play["host_durations"]
+            host_durations[host] = host_durations.get(host, 0.0) + t - started_at
+            self.host_durations[host] = self.host_durations.get(host, 0.0) + t - started_at
+
+        if task["_uuid"] not in self.task_durations:
+            self.task_durations[task["_uuid"]] = {
+                "play_name": self.play["name"],
+                "play_filename": self.play["filename"],
+                "task_name": task["task_name"],
+                "task_filename": task["filename"],
+            }
+        self.task_durations[task["_uuid"]]["start"] = task["started_at"]
+        self.task_durations[task["_uuid"]]["end"] = t
+
+    # Rows of slowest tasks table from dicts holding start and end
+    @staticmethod
+    def _slowest_tasks(tasks):
+        slowest = heapq.nlargest(CARADOC_SLOWEST_SIZE, tasks, key=lambda x: x["end"] - x["start"])
+        return [dict(x, duration=f"{x['end'] - x['start']:.2f}s") for x in slowest]
+
+    @staticmethod
+    def _slowest_hosts(host_durations):
+        slowest = heapq.nlargest(CARADOC_SLOWEST_SIZE, host_durations.items(), key=lambda x: x[1])
+        return [{"host": host, "duration": f"{duration:.2f}s"} for host, duration in slowest]
 
     def v2_runner_on_ok(self, result, **kwargs):
         self.log.debug("v2_runner_on_ok")
@@ -279,65 +779,88 @@ class CallbackModule(CallbackBase):
         # from Ara: result._task.delegate_to can end up being a variable from this hook, don't save it.
         # https://github.com/ansible/ansible/issues/75339
 
-    def _create_new_task_or_handler(self, task_or_handler, has_rescue=False):
-        name = self._get_new_task_name(task_or_handler)
-        task_or_handler_uuid = task_or_handler._uuid
-        if self.serial_count != 0:
-            task_or_handler_uuid = f"{task_or_handler_uuid}-{self.serial_count}"
+    def _create_new_task_or_handler(self, event):
+        name = self._get_new_task_name(event["name"], event["action"])
+        task_or_handler_uuid = self._task_uuid(event["uuid"])
 
         if task_or_handler_uuid not in self.tasks:
+            if self.low_memory and self.play["tasks"]:
+                self._compact_task(self.tasks[self.play["tasks"][-1]])
             self.play["tasks"].append(str(task_or_handler_uuid))
             self.tasks[task_or_handler_uuid] = {
                 "_uuid": task_or_handler_uuid,
-                "task_name": wrap_var(task_or_handler.get_name()),
+                "task_name": wrap_var(event["name"]),
                 "base_path": f"plays/{self.play['filename']}/{name}",
                 "filename": name,
-                "start_time": str(time.time()),
-                "tags": task_or_handler.tags,
-                "action": task_or_handler.action,
-                "path": task_or_handler.get_path(),
+                "start_time": event["start_time"],
+                "tags": event["tags"],
+                "action": event["action"],
+                "path": event["path"],
                 "results": {},
-                "has_rescue": has_rescue,
+                "has_rescue": event["has_rescue"],
+                "started_at": None,
+                "ended_at": None,
             }
+            # Task folder is created now rather than checked on each write of its files
+            self._ensure_dir(os.path.join(self.log_folder, self.tasks[task_or_handler_uuid]["base_path"]))
 
             new_task_latest = {
                 "task_uuid": task_or_handler_uuid,
-                "task_name": wrap_var(task_or_handler.get_name()),
+                "task_name": wrap_var(event["name"]),
                 "play_name": self.play["name"],
                 "play_filename": self.play["filename"],
-                "all_results": self._host_result_struct.copy(),
+                "all_results": self.stats.task(task_or_handler_uuid),
                 "task_filename": name,
             }
             self.latest_tasks[task_or_handler_uuid] = new_task_latest
-            self.latest_tasks = dict(list(self.latest_tasks.items())[-20:])
+            while len(self.latest_tasks) > self.latest_tasks_size:
+                self.latest_tasks.popitem(last=False)
+
+    # Host entries holding only a status are replaced by a shared entry
+    @staticmethod
+    def _compact_task(task):
+        results = task["results"]
+        for host, result in results.items():
+            if len(result) == 1 and "status" in result:
+                results[host] = CARADOC_STATUS_RESULTS.setdefault(
+                    result["status"], {"status": result["status"]}
+                )
+
+    # Entry of a host in task results that can be changed, shared entries are copied first
+    @staticmethod
+    def _host_result(task, host):
+        result = task["results"].get(host)
+        if result is None:
+            result = task["results"][host] = {}
+        elif CARADOC_STATUS_RESULTS.get(result.get("status")) is result:
+            result = task["results"][host] = dict(result)
+        return result
 
     def v2_playbook_on_notify(self, handler, host):
-        self._create_new_task_or_handler(handler)
-        self._save_play()
-        self._save_run()
+        event = self._task_event("notify", handler)
+        event["host"] = host.name
+        self._handle(event)
 
         self.playbook_on_notify(host, handler)
 
-    def v2_on_file_diff(self, result):
-        task_uuid = result._task._uuid
-        if self.serial_count != 0:
-            task_uuid = f"{task_uuid}-{self.serial_count}"
+    def _apply_notify(self, event):
+        self._create_new_task_or_handler(event)
+        self._save_play()
+        self._save_run()
 
-        current_task = self.tasks[task_uuid]
+    def v2_on_file_diff(self, result):
         ansi_escape3 = re.compile(
             r"(\x9B|\x1B\[)[0-?]*[ -/]*[@-~]", flags=re.IGNORECASE
         )
 
-        if result._host.name not in current_task["results"]:
-            current_task["results"][result._host.name] = {}
-
+        # for loops, diff of last changed item is kept
+        diff = None
         if result._task.loop and "results" in result._result:
             for res in result._result["results"]:
                 if "diff" in res and res["diff"] and res.get("changed", False):
-                    diff = self._get_diff(res["diff"])
-                    if diff:
-                        diff = ansi_escape3.sub("", diff)
-                        current_task["results"][result._host.name]["diff"] = diff
+                    item_diff = self._get_diff(res["diff"])
+                    if item_diff:
+                        diff = ansi_escape3.sub("", item_diff)
         elif (
             "diff" in result._result
             and result._result["diff"]
@@ -346,7 +869,27 @@ class CallbackModule(CallbackBase):
             diff = self._get_diff(result._result["diff"])
             if diff:
                 diff = ansi_escape3.sub("", diff)
-                current_task["results"][result._host.name]["diff"] = wrap_var(diff)
+
+        event = {"e": "diff", "task": result._task._uuid, "host": result._host.name}
+        if diff:
+            event["diff"] = diff
+        self._handle(event)
+
+    def _apply_diff(self, event):
+        task_uuid = self._task_uuid(event["task"])
+        current_task = self.tasks[task_uuid]
+
+        result = self._host_result(current_task, event["host"])
+        self._dirty_tasks.add(task_uuid)
+
+        if "diff" in event:
+            if self.low_memory:
+                path = current_task["base_path"]
+                name = f"{event['host']}.diff"
+                self._submit((path, name), self._save_as_file, (path, name, event["diff"]), snapshot=False)
+                result["diff_file"] = name
+            else:
+                result["diff"] = wrap_var(event["diff"])
 
     # TODO: track this event ?
     def v2_playbook_on_include(self, included_file):
@@ -355,117 +898,279 @@ class CallbackModule(CallbackBase):
 
     def v2_playbook_on_stats(self, stats):
         self.log.debug("v2_playbook_on_stats")
+        if self.get_option("fsync") == "stats":
+            self._fsync_writes = True
+        with self._state_lock:
+            if self._run_timer is not None:
+                self._run_timer.cancel()
+                self._run_timer = None
+        if self._writer is not None:
+            # Drain pending writes, final pages are then rendered synchronously
+            self._writer.close()
+            self.log.debug(f"caradoc writer dropped {self._writer.dropped} page updates")
+            self._writer = None
+        if self._unsynced is not None:
+            # files written from now on are flushed as they are written
+            self._sync_written()
+        if self._profiler is not None:
+            self._profile_rows = self._profiler.rows()
+        self._handle({"e": "stats"})
+        if self._results is not None:
+            self._results.close()
+            self._results = None
+            if self._fsync_writes:
+                self._fsync_path(os.path.join(self.log_folder, CaradocResultStore.FILENAME))
+        if self._events is not None:
+            self._events.close(fsync=self._fsync_writes)
+            self._events = None
+        if self._fsync_writes:
+            self._fsync_path(self.log_folder)
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+        self.log.debug(
+            "caradoc wrote {written_files} files ({written_bytes} bytes), "
+            "skipped {skipped_files} unchanged files ({skipped_bytes} bytes)".format(
+                **self.write_stats
+            )
+        )
+        # kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            peak = peak // 1024
+        display.v(f"caradoc: peak memory of Ansible main process {peak // 1024} MiB")
+        if self._profiler is not None:
+            report = self._profiler.report()
+            report["files"]["bytes"] = self.write_stats["written_bytes"]
+            report["files"]["skipped"] = self.write_stats["skipped_files"]
+            report["peak_rss_kib"] = peak
+            self._save_as_file("", "caradoc-profile.json", json.dumps(report, indent=4, sort_keys=True))
+
+    def _apply_stats(self, event):
         self._save_play()
-        self._save_run()
+        self._save_run(force=True)
 
     # TODO: may need some implementation of v2_runner_on_async_XXX also (ara does not implement anything)
 
-    # For a task name, will render base template
+    # For a task name, will render base template. Returns names of files holding truncated fields
     # TODO: split args as separate file since its the same for all results
-    def _save_result(self, result, task_name, status):
-        # TODO: a serializer may be better than this json tricky construction
-        # Also in final design may not need all of this an rely or links:[] (for host as an example)
-        results = strip_internal_keys(module_response_deepcopy(result._result))
-
-        task_uuid = result._task._uuid
-        if self.serial_count != 0:
-            task_uuid = f"{task_uuid}-{self.serial_count}"
-
-        current_task = self.tasks[task_uuid]
+    def _save_result(self, result, current_task):
+        # Ansible sends a private clean copy of the result to each callback: it is serialized as is,
+        #  no need for another deep copy nor a snapshot in async mode
+        path = current_task["base_path"]
+        host = result._host.name
+        overrides, blobs = self._truncate_result(host, result._result)
+        for blob_name, value in blobs.items():
+            self._submit(
+                (path, blob_name),
+                self._save_blob,
+                (path, blob_name, value),
+                snapshot=False,
+            )
 
-        json_result = {"result": wrap_var(results)}
-        self._template_and_save(
-            current_task["base_path"],
-            result._host.name + ".json",
-            CaradocTemplates.result,
-            json_result,
-            cache_name="result",
+        name = host + ".json"
+        self._submit(
+            (path, name),
+            self._encode_and_save,
+            (path, name, result._result, overrides),
+            snapshot=False,
+        )
+        return sorted(blobs)
+
+    # Oversized fields (strings or lists of strings like stdout_lines), at top level or in loop items, are
+    #  truncated in the JSON result, full values are spilled to <host>.<field>.gz or
+    #  <host>.results.<item>.<field>.gz. Returns (overridden top level fields, blobs by file name)
+    def _truncate_result(self, host, result):
+        max_field_size = self.result_max_field_size
+        max_file_size = self.result_max_file_size
+        if not max_field_size and not max_file_size:
+            return {}, {}
+
+        # sizes are estimated from string lengths, cheap compared to the serialization itself
+        sizes, values = {}, {}
+        for field, value in self._result_fields(result):
+            if isinstance(value, str):
+                sizes[field] = len(value)
+            elif isinstance(value, list) and all(isinstance(v, str) for v in value):
+                sizes[field] = sum(len(v) + 4 for v in value)
+            else:
+                continue
+            values[field] = value
+
+        keep = max_field_size or CARADOC_TRUNCATED_FIELD_SIZE
+        truncated = {k for k, size in sizes.items() if max_field_size and size > max_field_size}
+        if max_file_size:
+            total = sum(min(size, keep) if k in truncated else size for k, size in sizes.items())
+            for field in sorted(sizes, key=sizes.get, reverse=True):
+                if total <= max_file_size:
+                    break
+                if field not in truncated and sizes[field] > keep:
+                    truncated.add(field)
+                    total = total - sizes[field] + keep
+
+        overrides, blobs = {}, {}
+        for field in truncated:
+            index, key = field
+            value = values[field]
+            name = key if index is None else f"results.{index}.{key}"
+            blob_name = f"{host}.{re.sub(r'[^0-9a-zA-Z_.-]', '_', name)}.gz"
+            marker = f"... truncated by caradoc, {sizes[field]} characters in full value, see {blob_name}"
+            if isinstance(value, str):
+                value = value[:keep] + "\n" + marker
+            else:
+                kept, size = 0, 0
+                while kept < len(value) and size + len(value[kept]) + 4 <= keep:
+                    size = size + len(value[kept]) + 4
+                    kept = kept + 1
+                value = value[:kept] + [marker]
+            blobs[blob_name] = values[field]
+
+            if index is None:
+                overrides[key] = value
+            else:
+                # loop items holding a truncated field are shallow copies, other items are shared
+                items = overrides.setdefault("results", list(result["results"]))
+                if items[index] is result["results"][index]:
+                    items[index] = dict(items[index])
+                items[index][key] = value
+        return overrides, blobs
+
+    # ((loop item index or None, key), value) of top level fields and fields of loop items
+    @staticmethod
+    def _result_fields(result):
+        for key, value in result.items():
+            if isinstance(key, str) and not key.startswith("_ansible_"):
+                yield (None, key), value
+        items = result.get("results")
+        if isinstance(items, list):
+            for index, item in enumerate(items):
+                if not isinstance(item, dict):
+                    continue
+                for key, value in item.items():
+                    if isinstance(key, str) and not key.startswith("_ansible_"):
+                        yield (index, key), value
+
+    def _encode_and_save(self, path, name, result, overrides=None):
+        if overrides:
+            # shallow copy of the top level only, values are shared
+            result = dict(result)
+            result.update(overrides)
+        # starts with a line feed, as the former Jinja result template did
+        chunks = itertools.chain(("\n",), CaradocJSONEncoder().iterencode(result))
+        self._save_result_file(path, name, chunks)
+
+    # A string, or a list of strings written one per line
+    def _save_blob(self, path, name, value):
+        if isinstance(value, str):
+            chunks = (value,)
+        else:
+            chunks = (line + "\n" for line in value)
+        self._save_result_file(path, name, chunks, compress=True)
+
+    # Host result files go to the results store when there is one, else to files
+    def _save_result_file(self, path, name, chunks, compress=False):
+        if self._results is None:
+            self._save_as_file(path, name, chunks, compress=compress)
+            return
+        size = self._results.save(f"{path}/{name}", self._blocks(chunks), compress=compress)
+        self.write_stats["written_files"] = self.write_stats["written_files"] + 1
+        self.write_stats["written_bytes"] = self.write_stats["written_bytes"] + size
+
+    def _template_and_save(self, path, name, template, tpl_vars, cache_name=None, snapshot=True, droppable=None):
+        self._submit(
+            (path, name),
+            self._render_and_save,
+            (path, name, template, tpl_vars, cache_name),
+            snapshot=snapshot,
+            droppable=droppable,
         )
 
-    def _template_and_save(self, path, name, template, tpl_vars, cache_name=None):
+    # Run a render job now, or hand it to the writer thread in async mode.
+    #  Args are deep copied since state keeps on changing while the writer renders.
+    #  snapshot=False is for args already owned by the caller, those jobs are never dropped by the writer
+    #  unless droppable is given
+    def _submit(self, key, func, args, snapshot=True, droppable=None):
+        if self._writer is None:
+            func(*args)
+            return
+        if snapshot:
+            args = copy.deepcopy(args)
+        if droppable is None:
+            droppable = snapshot
+        self._writer.submit(key, func, args, droppable=droppable)
+
+    def _render_and_save(self, path, name, template, tpl_vars, cache_name):
         result = self._template(
-            self._playbook.get_loader(), template, tpl_vars, cache_name
+            self._loader, template, tpl_vars, cache_name
         )
         self._save_as_file(path, name, result)
 
-    def _increment_status_all(self, result, status, task_in_latest):
-
-        play_uuid = self.play["_uuid"]
-
-        self.play_results["plays"][play_uuid]["host_results"][result._host.name][
-            status
-        ] = (
-            self.play_results["plays"][play_uuid]["host_results"][result._host.name][
-                status
-            ]
-            + 1
-        )
-
-        self.play_results["plays"][play_uuid]["host_results"]["all"][status] = (
-            self.play_results["plays"][play_uuid]["host_results"]["all"][status] + 1
-        )
-        self.play_results["host_results"]["all"][status] = (
-            self.play_results["host_results"]["all"][status] + 1
-        )
-        self.play_results["host_results"][result._host.name][status] = (
-            self.play_results["host_results"][result._host.name][status] + 1
-        )
-        task_in_latest["all_results"][status] = (
-            task_in_latest["all_results"][status] + 1
-        )
+    def _increment_status_all(self, host, status, task_uuid):
+        self.stats.add(self.play["_uuid"], task_uuid, host, status)
 
-    def _count_results(self, result, status, task):
+    def _count_results(self, event, task):
+        host = event["host"]
+        status = event["status"]
         if status == "failed" and task["has_rescue"]:
             status = "rescued"
 
         if task["_uuid"] in self.tasks:
-            if result._host.name not in task["results"]:
-                task["results"][result._host.name] = {}
-            task["results"][result._host.name]["status"] = status
-
-            if (
-                result._host.name
-                not in self.play_results["plays"][self.play["_uuid"]]["host_results"]
-            ):
-                self.play_results["plays"][self.play["_uuid"]]["host_results"][
-                    result._host.name
-                ] = self._host_result_struct.copy()
-                self.play_results["host_results"][
-                    result._host.name
-                ] = self._host_result_struct.copy()
+            self._host_result(task, host)["status"] = status
+            self._dirty_tasks.add(task["_uuid"])
 
             self.task_end_count = self.task_end_count + 1
 
-            task_in_latest = self.latest_tasks[task["_uuid"]]
-            self._increment_status_all(result, status, task_in_latest)
+            self._increment_status_all(host, status, task["_uuid"])
 
             # an ignored but containaing a change => increment change also
+            if status == "ignored_failed" and event.get("loop_changed"):
+                self._increment_status_all(host, "changed", task["_uuid"])
+            # a changed or ignored result also counts as ok
+            if status == "changed" or status == "ignored_failed":
+                self._increment_status_all(host, "ok", task["_uuid"])
+
+    # Host result is written as is, event only holds what pages need
+    def _save_task(self, result, status="ok"):
+        event = {
+            "e": "result",
+            "task": result._task._uuid,
+            "host": result._host.name,
+            "status": status,
+        }
+        task_uuid = self._task_uuid(result._task._uuid)
+        if task_uuid in self.tasks:
             if (
                 status == "ignored_failed"
                 and "results" in result._result
                 and any(r["changed"] for r in result._result["results"])
             ):
-                self._increment_status_all(result, "changed", task_in_latest)
-            # a changed or ignored result also counts as ok
-            if status == "changed" or status == "ignored_failed":
-                self._increment_status_all(result, "ok", task_in_latest)
-
-    def _save_task(self, result, status="ok"):
-        task_uuid = result._task._uuid
-        if self.serial_count != 0:
-            task_uuid = f"{task_uuid}-{self.serial_count}"
-
+                event["loop_changed"] = True
+            with self._state_lock:
+                blobs = self._save_result(result, self.tasks[task_uuid])
+            if blobs:
+                event["blobs"] = blobs
+        self._handle(event)
+
+    def _apply_result(self, event):
+        task_uuid = self._task_uuid(event["task"])
+        if "t" in event:
+            started_at = self._host_starts.pop((task_uuid, event["host"]), None)
+            self.series[self.play["_uuid"]].host_end(event["t"], started_at is not None)
         if task_uuid in self.tasks:
             task = self.tasks[task_uuid]
 
-            self._count_results(result, status, task)
-
-            self._save_result(result, task["task_name"], status)
+            self._count_results(event, task)
+            if "t" in event:
+                self._track_duration(task, event["host"], event["t"], started_at)
+            if "blobs" in event:
+                task["results"][event["host"]]["blobs"] = event["blobs"]
             self._save_task_readme(task)
 
         self._save_run()
 
     def _save_task_readme(self, task):
+        if not self._rendering:
+            return
         json_task_lists = {
             "env_rel_path": "../../../..",
             "task": task,
@@ -481,59 +1186,131 @@ class CallbackModule(CallbackBase):
         )
 
     def _save_play(self):
+        if not self._rendering:
+            return
         play_name = self.play["filename"]
         # Dont dump play if no task did run
-        if (
-            self.play_results["plays"][self.play["_uuid"]]["host_results"]["all"]
-            != self._host_result_struct
-        ):
+        if self.play_results["plays"][self.play["_uuid"]]["host_results"].has_results():
             json_play = {
                 "play": self.play,
                 "env_rel_path": "../../..",
-                "tasks": self.tasks,
                 "hosts_results": self.play_results["plays"][self.play["_uuid"]][
                     "host_results"
                 ],
                 "all_mode": False,
+                "slowest_tasks": self._slowest_tasks(
+                    {
+                        "task_name": task["task_name"],
+                        "task_filename": task["filename"],
+                        "start": task["started_at"],
+                        "end": task["ended_at"],
+                    }
+                    for task in self.tasks.values()
+                    if task["ended_at"] is not None
+                ),
+                "slowest_hosts": self._slowest_hosts(self.play.get("host_durations", {})),
             }
+            # Only tasks that received results since last save get their rows rendered again
+            dirty_tasks = {uuid: self.tasks[uuid] for uuid in self._dirty_tasks}
+            self._dirty_tasks = set()
 
             path = f"plays/{play_name}/"
 
-            self._template_and_save(
-                path,
-                "README.adoc",
-                CaradocTemplates.playbook,
-                json_play,
-                cache_name="playbook",
+            # Never dropped: rows of dirty tasks would be lost
+            self._submit(
+                (path, "README.adoc"),
+                self._render_play,
+                (path, json_play, dirty_tasks),
+                droppable=False,
             )
 
-            self._template_and_save(
-                path,
-                "charts.adoc",
-                CaradocTemplates.playbook_charts,
-                json_play,
-                cache_name="playbook_charts",
+    def _render_play(self, path, json_play, dirty_tasks):
+        play_uuid = json_play["play"]["_uuid"]
+        if self._play_rows_uuid != play_uuid:
+            self._play_rows = {}
+            self._play_rows_uuid = play_uuid
+
+        loader = self._loader
+        for task_uuid, task in dirty_tasks.items():
+            self._play_rows[task_uuid] = tuple(
+                self._template(
+                    loader,
+                    CaradocTemplates.playbook_task_rows,
+                    {"task": task, "all_mode": all_mode},
+                    "playbook_task_rows",
+                )
+                for all_mode in (False, True)
             )
 
-            json_play["all_mode"] = True
-            self._template_and_save(
-                path,
-                "all.adoc",
-                CaradocTemplates.playbook,
-                json_play,
-                cache_name="playbook",
-            )
+        rows = [
+            self._play_rows.get(task_uuid, ("", ""))
+            for task_uuid in reversed(json_play["play"]["tasks"])
+        ]
+
+        # rows are already rendered, wrap them to avoid any templating of task names
+        json_play["task_rows"] = wrap_var("".join(row[0] for row in rows))
+        self._render_and_save(
+            path, "README.adoc", CaradocTemplates.playbook, json_play, "playbook"
+        )
+        self._render_and_save(
+            path,
+            "charts.adoc",
+            CaradocTemplates.playbook_charts,
+            json_play,
+            "playbook_charts",
+        )
+
+        json_play["all_mode"] = True
+        json_play["task_rows"] = wrap_var("".join(row[1] for row in rows))
+        self._render_and_save(
+            path, "all.adoc", CaradocTemplates.playbook, json_play, "playbook"
+        )
+
+    # Run pages summarize everything, render them at most once per run_refresh_interval unless forced.
+    #  Changes within the interval are rendered when it ends
+    def _save_run(self, force=False):
+        if not self._rendering:
+            return
+        self._run_dirty = True
+        now = time.monotonic()
+        if (
+            not force
+            and self._run_saved_at is not None
+            and now - self._run_saved_at < self.run_refresh_interval
+        ):
+            if self._run_timer is None:
+                self._run_timer = threading.Timer(
+                    self.run_refresh_interval - (now - self._run_saved_at), self._save_pending_run
+                )
+                self._run_timer.daemon = True
+                self._run_timer.start()
+            return
+        self._run_dirty = False
+        self._run_saved_at = now
+
+        # Counters and latest tasks are the only state shared with the strategy thread, other values
+        #  are built for this render. In async mode they are copied once for both run pages
+        play_results, latest_tasks = self.play_results, self.latest_tasks
+        if self._writer is not None:
+            play_results, latest_tasks = copy.deepcopy((play_results, latest_tasks))
 
-    def _save_run(self):
         json_run = {
-            "play_results": self.play_results,
-            "tasks": self.tasks,
-            "latest_tasks": self.latest_tasks,
+            "play_results": play_results,
+            "latest_tasks": latest_tasks,
+            "latest_tasks_size": self.latest_tasks_size,
+            "slowest_tasks": self._slowest_tasks(self.task_durations.values()),
+            "slowest_hosts": self._slowest_hosts(self.host_durations),
+            "timeline": [
+                {"play": x["play_name"], "task": f"{x['play_filename']}/{x['task_filename']}", "start": x["start"], "end": x["end"]}
+                for x in list(self.task_durations.values())[-CARADOC_TIMELINE_SIZE:]
+            ],
+            "flight": CaradocSeries.points(self.series.values()),
+            "profile": self._profile_rows,
             "run_date": self.run_date,
         }
 
         self._template_and_save(
-            "./", "README.adoc", CaradocTemplates.run, json_run, cache_name="run"
+            "./", "README.adoc", CaradocTemplates.run, json_run, cache_name="run", snapshot=False, droppable=True
         )
         self._template_and_save(
             "./",
@@ -541,41 +1318,207 @@ class CallbackModule(CallbackBase):
             CaradocTemplates.run_charts,
             json_run,
             cache_name="run_charts",
+            snapshot=False,
+            droppable=True,
         )
 
-    def _save_as_file(self, path, name, content):
+    # Flush the coalesced run page still pending when the refresh interval ends
+    def _save_pending_run(self):
+        with self._state_lock:
+            self._run_timer = None
+            if self._run_dirty:
+                self._save_run(force=True)
+
+    # content is either a string or an iterable of string chunks, chunks are written
+    #  by blocks as they come so large contents are never fully held in memory
+    def _save_as_file(self, path, name, content, compress=False):
         path = os.path.join(self.log_folder, path)
-        if not os.path.exists(path):
-            makedirs_safe(path)
+        self._ensure_dir(path)
 
         path = os.path.join(path, name)
-        with open(path, "wb") as fd:
-            fd.write(to_bytes(content))
+
+        # Pages are often rendered again with no change: skip the write if content did not change
+        #  since last write. Streamed contents are host results written once, they are not hashed
+        if isinstance(content, str):
+            blocks = (to_bytes(content),)
+            digest = hashlib.sha1(blocks[0]).digest()
+            if self._file_digests.get(path) == digest:
+                self.write_stats["skipped_files"] = self.write_stats["skipped_files"] + 1
+                self.write_stats["skipped_bytes"] = (
+                    self.write_stats["skipped_bytes"] + len(blocks[0])
+                )
+                return
+        else:
+            blocks = self._blocks(content)
+            digest = None
+
+        size = 0
+        # read once, fsync=stats turns it on while the writer thread may be writing
+        fsync = self._fsync_writes
+        # Write a temporary file of same folder then rename it, so readers never see a partial file
+        tmp_fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(tmp_fd, "wb") as raw:
+                # mtime is fixed so that same content gives same gzip file
+                with (
+                    gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+                    if compress
+                    else contextlib.nullcontext(raw)
+                ) as fd:
+                    for block in blocks:
+                        size = size + len(block)
+                        fd.write(block)
+                os.fchmod(raw.fileno(), self._file_mode)
+                if fsync:
+                    raw.flush()
+                    os.fsync(raw.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+        if fsync:
+            self._fsync_path(os.path.dirname(path))
+        elif self._unsynced is not None:
+            self._unsynced.add(path)
+
+        if digest is not None:
+            self._file_digests[path] = digest
+        else:
+            self._file_digests.pop(path, None)
+        self.write_stats["written_files"] = self.write_stats["written_files"] + 1
+        self.write_stats["written_bytes"] = self.write_stats["written_bytes"] + size
+
+    # fsync=stats: flush files written so far, then their folders up to the base log folder so that
+    #  renames and created folders are flushed too
+    def _sync_written(self):
+        folders = set()
+        for path in self._unsynced:
+            self._fsync_path(path)
+            for folder in self._log_parents(path):
+                if folder in folders:
+                    break
+                folders.add(folder)
+        self._unsynced = None
+        for folder in sorted(folders, reverse=True):
+            self._fsync_path(folder)
+
+    # Folders holding path, from its own up to the parent of the base log folder. Paths are made absolute
+    #  so that a relative log folder such as "." still has a parent and sibling folders are told apart
+    def _log_parents(self, path):
+        base_folder = os.path.dirname(os.path.abspath(self.log_folder))
+        folder = os.path.dirname(os.path.abspath(path))
+        while os.path.commonpath([folder, base_folder]) == base_folder:
+            yield folder
+            if folder == base_folder:
+                break
+            folder = os.path.dirname(folder)
+
+    # Flush a file or a folder to disk
+    @staticmethod
+    def _fsync_path(path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # Create a folder if needed, folders already checked or created are not checked again.
+    #  Paths are normalized, callers join paths with or without trailing or "./" parts
+    def _ensure_dir(self, path):
+        path = os.path.normpath(path)
+        if path in self._known_dirs:
+            return
+        if not os.path.isdir(path):
+            makedirs_safe(path)
+            if self._fsync_writes:
+                # several levels may have been created, flush parents up to the base log folder
+                for folder in self._log_parents(path):
+                    self._fsync_path(folder)
+        self._known_dirs.add(path)
+
+    # Join string chunks as bytes blocks of about CARADOC_WRITE_BUFFER_SIZE
+    @staticmethod
+    def _blocks(chunks):
+        block, block_size = [], 0
+        for chunk in chunks:
+            block.append(chunk)
+            block_size = block_size + len(chunk)
+            if block_size >= CARADOC_WRITE_BUFFER_SIZE:
+                yield to_bytes("".join(block))
+                block, block_size = [], 0
+        yield to_bytes("".join(block))
 
     # Render a caradoc template, including jinja common macros plus static include of env if asked
     def _template(self, loader, template, variables, cache_name):
-        # add special variable to refer a cache name for CaradocTemplar
-        variables["_cache_name"] = cache_name
-        _templar = CaradocTemplar(loader=loader, variables=variables)
+        if self.renderer == "native" and cache_name in CaradocNativeRenderer.renders:
+            return CaradocNativeRenderer.renders[cache_name](variables)
+
+        if self._templar is None:
+            self._templar = CaradocTemplar(
+                loader=loader, bytecode_cache=self._bytecode_cache
+            )
+        self._templar.available_variables = variables
 
-        template = CaradocTemplates.jinja_macros + "\n" + template
-        return _templar.template(template)
+        _, source, key = caradoc_template_source(template, cache_name)
+        return self._templar.do_template(source, cache_key=key)
 
 
 display = Display()
 
 
+# Returns (name, source, key) of a template: source includes jinja common macros, key is the source sha256.
+#  Built once per template text, built-in templates are registered at module load
+def caradoc_template_source(template, name=None):
+    entry = CARADOC_SOURCES.get(template)
+    if entry is None:
+        source = CaradocTemplates.jinja_macros + "\n" + template
+        entry = (name, source, hashlib.sha256(to_bytes(source)).hexdigest())
+        CARADOC_SOURCES[template] = entry
+    return entry
+
+
 # Specific Templar that deals with bytecode cache
 class CaradocTemplar(Templar):
-    def __init__(self, loader, variables=None):
-        ansible_version = LooseVersion(ansible.__version__)
-
-        # Check Ansible version
-        if ansible_version < LooseVersion('2.16'):
+    def __init__(self, loader, variables=None, bytecode_cache=None):
+        if ANSIBLE_TEMPLAR_LEGACY:
             super().__init__(loader, shared_loader_obj=None, variables=variables)
         else:
             super().__init__(loader, variables)
         self.template_cache = {}
+        self.bytecode_cache = bytecode_cache
+
+    # Same as environment.from_string, loading compiled code from the on disk cache when possible
+    def _from_string(self, data, key):
+        myenv = self.environment
+        if self.bytecode_cache is None:
+            return myenv.from_string(data)
+
+        # Compiled code also depends on Ansible environment, Jinja checks its bytecode version and source checksum
+        name = "-".join(
+            [
+                type(myenv).__name__,
+                ansible.__version__,
+                jinja2.__version__,
+                key,
+            ]
+        )
+        bucket = self.bytecode_cache.get_bucket(myenv, name, None, data)
+        if bucket.code is None:
+            bucket.code = myenv.compile(data)
+            try:
+                self.bytecode_cache.set_bucket(bucket)
+            except OSError as e:
+                display.debug("Unable to save caradoc bytecode cache: %s" % to_text(e))
+
+        return myenv.template_class.from_code(
+            myenv, bucket.code, myenv.make_globals(None), None
+        )
+
+    # Caradoc variables are plain data: AnsibleJ2Vars calls this on each variable lookup,
+    #  return them as is instead of walking and templating them again for every access
+    def template(self, variable, *args, **kwargs):
+        return variable
 
     #  Note: the template method is a simplified implementation of Templar. Only fail_on_undefined is supported
     def do_template(
@@ -590,17 +1533,22 @@ class CaradocTemplar(Templar):
         static_vars=None,
         cache=True,
         disable_lookups=False,
+        cache_key=None,
     ):
+        if fail_on_undefined is None:
+            fail_on_undefined = self._fail_on_undefined_errors
+        if cache_key is None:
+            cache_key = hashlib.sha256(to_bytes(data)).hexdigest()
         try:
-            myenv = self.environment
-            cache_name = self._available_variables["_cache_name"]
-
             try:
-                if cache_name not in CARADOC_CACHE:
-                    t = myenv.from_string(data)
-                    CARADOC_CACHE[cache_name] = t
+                t = CARADOC_CACHE.get(cache_key)
+                if t is None:
+                    t = self._from_string(data, cache_key)
+                    CARADOC_CACHE[cache_key] = t
+                    if len(CARADOC_CACHE) > CARADOC_CACHE_SIZE:
+                        CARADOC_CACHE.popitem(last=False)
                 else:
-                    t = CARADOC_CACHE[cache_name]
+                    CARADOC_CACHE.move_to_end(cache_key)
 
             except TemplateSyntaxError as e:
                 raise AnsibleError(
@@ -652,6 +1600,330 @@ class CaradocTemplar(Templar):
                 return data
 
 
+# Renders and writes report files in a background thread, fed by a bounded queue.
+#  A single thread keeps writes ordered so the latest render of a file always wins.
+class CaradocWriter:
+    def __init__(self, queue_size, policy="block"):
+        self.policy = policy
+        self.dropped = 0
+        # latest dropped job per target file, replayed on close if no newer job was queued
+        self._dropped_jobs = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(
+            target=self._run, name="caradoc-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, key, func, args, droppable=True):
+        job = (func, args)
+        if droppable and self.policy == "drop":
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                with self._lock:
+                    self.dropped = self.dropped + 1
+                    self._dropped_jobs[key] = job
+                return
+        else:
+            self._queue.put(job)
+
+        with self._lock:
+            self._dropped_jobs.pop(key, None)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                func, args = job
+                func(*args)
+            except Exception as e:
+                display.warning(f"caradoc: unable to write report file: {to_text(e)}")
+            finally:
+                self._queue.task_done()
+
+    # Wait for every pending job, then write pages that were dropped and never refreshed
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        for func, args in self._dropped_jobs.values():
+            func(*args)
+        self._dropped_jobs = {}
+
+
+# Encodes a host result exactly as `strip_internal_keys(result) | to_nice_json` would, but internal
+#  `_ansible_` keys are skipped while encoding: large results (facts, stdout) are neither copied nor wrapped
+class CaradocJSONEncoder(AnsibleJSONEncoder):
+    internal_prefix = "_ansible_"
+
+    def __init__(self):
+        super().__init__(indent=4, sort_keys=True, separators=(",", ": "))
+        self.indent_str = " " * self.indent
+
+    # Same as to_nice_json defaults, vaulted values are dumped as text
+    def default(self, o):
+        if getattr(o, "__ENCRYPTED__", False):
+            return to_text(o, errors="surrogate_or_strict")
+        return super().default(o)
+
+    def iterencode(self, o, _one_shot=False):
+        return self._iterencode(o, 0, True)
+
+    @staticmethod
+    def _floatstr(o):
+        if o != o:
+            return "NaN"
+        if o == float("inf"):
+            return "Infinity"
+        if o == -float("inf"):
+            return "-Infinity"
+        return float.__repr__(o)
+
+    def _scalar(self, o):
+        if isinstance(o, str):
+            return json.encoder.encode_basestring_ascii(o)
+        if o is None:
+            return "null"
+        if o is True:
+            return "true"
+        if o is False:
+            return "false"
+        if isinstance(o, int):
+            return int.__repr__(o)
+        if isinstance(o, float):
+            return self._floatstr(o)
+        return None
+
+    # strip follows strip_internal_keys, which walks dicts and lists only
+    def _iterencode(self, o, level, strip):
+        scalar = self._scalar(o)
+        if scalar is not None:
+            yield scalar
+        elif isinstance(o, list):
+            yield from self._iterencode_list(o, level, strip)
+        elif isinstance(o, tuple):
+            yield from self._iterencode_list(o, level, False)
+        elif isinstance(o, dict):
+            yield from self._iterencode_dict(o, level, strip)
+        else:
+            yield from self._iterencode(self.default(o), level, strip)
+
+    def _iterencode_list(self, lst, level, strip):
+        if not lst:
+            yield "[]"
+            return
+        newline_indent = "\n" + self.indent_str * (level + 1)
+        buf = "[" + newline_indent
+        for value in lst:
+            scalar = self._scalar(value)
+            if scalar is not None:
+                yield buf + scalar
+            else:
+                yield buf
+                yield from self._iterencode(value, level + 1, strip)
+            buf = self.item_separator + newline_indent
+        yield "\n" + self.indent_str * level + "]"
+
+    def _iterencode_dict(self, dct, level, strip):
+        items = dct.items()
+        if strip:
+            prefix = self.internal_prefix
+            items = [
+                (k, v)
+                for k, v in items
+                if not (isinstance(k, str) and k.startswith(prefix))
+            ]
+        if not items:
+            yield "{}"
+            return
+        newline_indent = "\n" + self.indent_str * (level + 1)
+        yield "{" + newline_indent
+        first = True
+        for key, value in sorted(items):
+            if isinstance(key, str):
+                pass
+            elif isinstance(key, float):
+                key = self._floatstr(key)
+            elif key is True:
+                key = "true"
+            elif key is False:
+                key = "false"
+            elif key is None:
+                key = "null"
+            elif isinstance(key, int):
+                key = int.__repr__(key)
+            else:
+                raise TypeError(
+                    f"keys must be str, int, float, bool or None, not {key.__class__.__name__}"
+                )
+            if first:
+                first = False
+            else:
+                yield self.item_separator + newline_indent
+            yield json.encoder.encode_basestring_ascii(key) + self.key_separator
+            scalar = self._scalar(value)
+            if scalar is not None:
+                yield scalar
+            else:
+                yield from self._iterencode(value, level + 1, strip)
+        yield "\n" + self.indent_str * level + "}"
+
+
+# Plain Python versions of the most rendered templates, used when renderer is native.
+#  Output must be byte for byte identical to CaradocTemplates, any template change must be reported here
+class CaradocNativeRenderer:
+    status_labels = {
+        "ok": "🟢",
+        "changed": "🟡",
+        "failed": "🔴",
+        "ignored_failed": "🟣",
+        "skipped": "🔵",
+        "unreachable": "💀",
+        "running": "⚡",
+        "rescued": "♻️",
+    }
+
+    # Same as replace('!', '\!') | replace('|', '\|') used in tables of run template
+    @staticmethod
+    def _escape_cell(value):
+        return str(value).replace("!", "\\!").replace("|", "\\|")
+
+    # Same as `value | string if value > 0 else ''`
+    @staticmethod
+    def _count(value):
+        return str(value) if value > 0 else ""
+
+    # Rendered templates start with the line feed that separates them from common macros
+    @classmethod
+    def task(cls, tpl_vars):
+        env_rel_path = tpl_vars.get("env_rel_path", "..")
+        task = tpl_vars["task"]
+        results = task.get("results", {})
+        out = [
+            f"\n\ninclude::{env_rel_path}/.caradoc.env.adoc[]\n\n"
+            f"= TASK: {task['task_name']} (link:{{source-file-scheme}}+++{task['path']}+++[view source])\n\n"
+            f":toc:\ninclude::{env_rel_path}/.caradoc.css.adoc[]\n\n"
+            "== Links\n\n"
+            f"* Playbook: link:../README{{relfilesuffix}}[+++{tpl_vars['play_name']}+++](link:../all{{relfilesuffix}}[all tasks])\n"
+            "* Run: link:../../../README{relfilesuffix}[run]\n\n"
+            "== Results\n\n"
+        ]
+        if len(results) == 0:
+            out.append("+++ ... waiting ... +++")
+
+        # Jinja sort filter is case insensitive
+        for host in sorted(results, key=lambda h: h.lower()):
+            result = results[host]
+            label = cls.status_labels.get(result.get("status", "running"), "")
+            out.append(f"\n=== {label} {host} (link:./{host}.json[view raw])\n\n")
+            diff = result.get("diff", "")
+            if result.get("diff_file", ""):
+                out.append(f"==== Diff\n\n[,diff]\n-------\ninclude::{result['diff_file']}[]\n-------\n\n")
+            elif diff:
+                out.append(f"==== Diff\n\n[,diff]\n-------\n{diff}\n-------\n\n")
+            blobs = result.get("blobs", [])
+            if blobs:
+                out.append("==== Truncated fields\n\n")
+                out.extend(f"* link:./{blob}[{blob}]\n" for blob in blobs)
+                out.append("\n")
+            out.append(
+                "\n==== Result\n\n.hide/show\n[%collapsible%open]\n=====\n[,json]\n-------\n"
+                f"include::{host}.json[]\n-------\n=====\n"
+            )
+        return "".join(out)
+
+    @classmethod
+    def run(cls, tpl_vars):
+        env_rel_path = tpl_vars.get("env_rel_path", "..")
+        play_results = tpl_vars["play_results"]
+        plays = play_results.get("plays", {})
+        latest_tasks = tpl_vars["latest_tasks"]
+        all_results = play_results["host_results"]["all"]
+        esc = cls._escape_cell
+        count = cls._count
+
+        out = [
+            f"\n\ninclude::{env_rel_path}/.caradoc.env.adoc[]\n\n"
+            f"= ⚡ | {tpl_vars['run_date']}\n\n"
+            f"include::{env_rel_path}/.caradoc.css.adoc[]\n\n"
+            '[cols="15a,35a,15a,15a"]\n|====\n|\n[.text-center]\n'
+            f"📒 Plays : *{len(plays)}* / 🖥️ Hosts: *{len(play_results['host_results']) - 1}* (link:./charts{{relfilesuffix}}[view charts])\n\n"
+            "|\n[.text-center]\n"
+            f"🟢 ok: *{all_results['ok']}* (inc. 🟡changed: {all_results['changed']}, 🟣ignored: {all_results['ignored_failed']})\n\n"
+            "|\n[.text-center]\n"
+            f"♻️rescued:{all_results['rescued']}\n\n"
+            "|\n[.text-center]\n"
+            f"🔴 failed: *{all_results['failed']}*\n\n"
+            "|\n|====\n\n"
+            '[.no-border]\n[cols="35a,65a"]\n|====\n|\n[.text-center]\n'
+            "*Plays (reversed by start time)*\n"
+            '[%header,cols="100a,5,5"]\n!=====\n! Play ! 🟢 ! 🔴\n'
+        ]
+        for play_uuid in reversed(plays):
+            play = plays[play_uuid]
+            out.append(
+                f"! link:+++plays/{esc(play['filename'])}/README+++{{relfilesuffix}}[+++{esc(play['name'])}+++]\n"
+                f"! {play['host_results']['all']['ok']}\n"
+                f"! {play['host_results']['all']['failed']}\n"
+            )
+        out.append(
+            f"!=====\n\n|\n[.text-center]\n*Last {tpl_vars.get('latest_tasks_size', 20)} tasks*\n"
+            '[%header,cols="50,70,5,5,5,5,5,5"]\n[.tasks_longest]\n[.emoji_table]\n!=====\n'
+            "! Play\n! Task ! 🟢 ! 🔴 ! 🟡 ! 🟣  ! 🔵 ! ♻️\n"
+        )
+        for task_uuid in reversed(latest_tasks):
+            x = latest_tasks[task_uuid]
+            task_results = x["all_results"]
+            play_filename = esc(x["play_filename"])
+            out.append(
+                f"! link:+++plays/{play_filename}/README+++{{relfilesuffix}}[+++{esc(x['play_name'])}+++]\n"
+                f"! link:+++plays/{play_filename}/{esc(x['task_filename'])}/README+++{{relfilesuffix}}[+++{esc(x['task_name'] or 'no_name')}+++]\n"
+                f"! {count(task_results['ok'])}\n"
+                f"! {count(task_results['failed'])}\n"
+                f"! {count(task_results['changed'])}\n"
+                f"! {count(task_results['ignored_failed'])}\n"
+                f"! {count(task_results['skipped'])}\n"
+                f"! {count(task_results['rescued'])}\n"
+            )
+        out.append(
+            "!=====\n\n|\n|====\n\n"
+            '[.no-border]\n[cols="65a,35a"]\n|====\n|\n[.text-center]\n*Slowest tasks*\n'
+            '[%header,cols="50,70,10"]\n!=====\n! Play ! Task ! ⏱️\n'
+        )
+        for x in tpl_vars.get("slowest_tasks", []):
+            play_filename = esc(x["play_filename"])
+            out.append(
+                f"! link:+++plays/{play_filename}/README+++{{relfilesuffix}}[+++{esc(x['play_name'])}+++]\n"
+                f"! link:+++plays/{play_filename}/{esc(x['task_filename'])}/README+++{{relfilesuffix}}[+++{esc(x['task_name'] or 'no_name')}+++]\n"
+                f"! {x['duration']}\n"
+            )
+        out.append(
+            "!=====\n\n|\n[.text-center]\n*Slowest hosts*\n"
+            '[%header,cols="70,10"]\n!=====\n! Host ! ⏱️\n'
+        )
+        for x in tpl_vars.get("slowest_hosts", []):
+            out.append(f"! {esc(x['host'])}\n! {x['duration']}\n")
+        out.append("!=====\n\n|====")
+        profile = tpl_vars.get("profile", [])
+        if profile:
+            out.append(
+                "\n\n.Caradoc overhead, until playbook end\n"
+                '[%header,cols="40,10,10,10"]\n|====\n| Measure | Calls | Wall (s) | CPU (s)\n'
+            )
+            out.extend(f"| {x['name']}\n| {x['calls']}\n| {x['wall']}\n| {x['cpu']}\n" for x in profile)
+            out.append("|====\n")
+        return "".join(out)
+
+
+# Native renders by template cache name
+CaradocNativeRenderer.renders = {
+    "tasks": CaradocNativeRenderer.task,
+    "run": CaradocNativeRenderer.run,
+}
+
+
 class CaradocTemplates:
     # Applied to any adoc template, ensure fragments can be viewed with proper display
 
@@ -708,8 +1980,6 @@ class CaradocTemplates:
 {%- endmacro %}
 """
 
-    # Raw result
-    result = "{{ result | default({}) |to_nice_json }}"
     task = """
 include::{{ env_rel_path | default('..') }}/.caradoc.env.adoc[]
 
@@ -732,14 +2002,26 @@ include::{{ env_rel_path | default('..') }}/.caradoc.css.adoc[]
 
 === {{ task_status_label(task.results[host].status | default('running')) }} {{ host }} (link:./{{ host }}.json[view raw])
 
-{% if task.results[host].diff | default('') %}
+{% if task.results[host].diff | default('') or task.results[host].diff_file | default('') %}
 ==== Diff
 
 [,diff]
 -------
+{% if task.results[host].diff_file | default('') %}
+include::{{ task.results[host].diff_file }}[]
+{% else %}
 {{ task.results[host].diff | default('') }}
+{% endif %}
 -------
 
+{% endif %}
+{% if task.results[host].blobs | default([]) %}
+==== Truncated fields
+
+{% for blob in task.results[host].blobs %}
+* link:./{{ blob }}[{{ blob }}]
+{% endfor %}
+
 {% endif %}
 
 ==== Result
@@ -818,6 +2100,36 @@ include::{{ env_rel_path | default('..') }}/.caradoc.css.adoc[]
 |
 |====
 
+== Durations
+[.no-border]
+[cols="65a,35a"]
+|====
+|
+[.text-center]
+*Slowest tasks*
+[%header,cols="70,10"]
+!=====
+! Task ! ⏱️
+{% for x in slowest_tasks | default([]) %}
+! link:+++{{ './' + x.task_filename | replace('!', '\!') | replace('|', '\|') }}/README+++{relfilesuffix}[+++{{ x.task_name | default('no_name', True) | replace('!', '\!') | replace('|', '\|') }}+++]
+! {{ x.duration }}
+{% endfor %}
+!=====
+
+|
+[.text-center]
+*Slowest hosts*
+[%header,cols="70,10"]
+!=====
+! Host ! ⏱️
+{% for x in slowest_hosts | default([]) %}
+! {{ x.host | replace('!', '\!') | replace('|', '\|') }}
+! {{ x.duration }}
+{% endfor %}
+!=====
+
+|====
+
 
 == Links
 {% if not all_mode | default(False) %}
@@ -840,20 +2152,23 @@ table tr td:first-child p a {
 
 [cols="1,30,~,~,15"]
 |====
-{% for i in play['tasks'] | reverse %}
-{% set result_sorted=tasks[i]['results'] | dictsort %}
+{{ task_rows | default('') -}}
+|====
+
+"""
+
+    # Rows of one task in the playbook table, rendered only when the task gets new results
+    playbook_task_rows = """
+{%- set result_sorted=task['results'] | dictsort %}
 {% for host, result in result_sorted %}
 {% if all_mode or ( (result.status | default('running') != 'ok') and (result.status | default('running') != 'skipped') ) %}
-| link:+++{{ './' + tasks[i].filename }}/README+++{relfilesuffix}[+++{{ task_status_label(result.status | default('running')) }}+++]
+| link:+++{{ './' + task.filename }}/README+++{relfilesuffix}[+++{{ task_status_label(result.status | default('running')) }}+++]
 | {{ host }}
-| link:+++{{ './' + tasks[i].filename }}/README+++{relfilesuffix}[+++{{ tasks[i].task_name | default('no_name') | replace("|","\|") }}+++]
-| {{ tasks[i].action }}
-| {{ tasks[i].tags | default('[]') | string }}
+| link:+++{{ './' + task.filename }}/README+++{relfilesuffix}[+++{{ task.task_name | default('no_name') | replace("|","\|") }}+++]
+| {{ task.action }}
+| {{ task.tags | default('[]') | string }}
 {% endif %}
 {% endfor %}
-{% endfor %}
-|====
-
 """
 
     # TODO: create macro for tasks "ok (inc. x x x x)" and share with playbook template
@@ -903,7 +2218,7 @@ include::{{ env_rel_path | default('..') }}/.caradoc.css.adoc[]
 
 |
 [.text-center]
-*Last 20 tasks*
+*Last {{ latest_tasks_size | default(20) | string }} tasks*
 [%header,cols="50,70,5,5,5,5,5,5"]
 [.tasks_longest]
 [.emoji_table]
@@ -925,6 +2240,51 @@ include::{{ env_rel_path | default('..') }}/.caradoc.css.adoc[]
 
 |
 |====
+
+[.no-border]
+[cols="65a,35a"]
+|====
+|
+[.text-center]
+*Slowest tasks*
+[%header,cols="50,70,10"]
+!=====
+! Play ! Task ! ⏱️
+{% for x in slowest_tasks | default([]) %}
+! link:+++plays/{{ x.play_filename  | replace('!', '\!') | replace('|', '\|') }}/README+++{relfilesuffix}[+++{{ x.play_name | replace('!', '\!') | replace('|', '\|') }}+++]
+! link:+++plays/{{ x.play_filename  | replace('!', '\!') | replace('|', '\|') }}/{{ x.task_filename  | replace('!', '\!') | replace('|', '\|')  }}/README+++{relfilesuffix}[+++{{ x.task_name | default('no_name', True) | replace('!', '\!') | replace('|', '\|')  }}+++]
+! {{ x.duration }}
+{% endfor %}
+!=====
+
+|
+[.text-center]
+*Slowest hosts*
+[%header,cols="70,10"]
+!=====
+! Host ! ⏱️
+{% for x in slowest_hosts | default([]) %}
+! {{ x.host | replace('!', '\!') | replace('|', '\|') }}
+! {{ x.duration }}
+{% endfor %}
+!=====
+
+|====
+{%- if profile | default([]) %}
+
+
+.Caradoc overhead, until playbook end
+[%header,cols="40,10,10,10"]
+|====
+| Measure | Calls | Wall (s) | CPU (s)
+{% for x in profile %}
+| {{ x.name }}
+| {{ x.calls | string }}
+| {{ x.wall }}
+| {{ x.cpu }}
+{% endfor %}
+|====
+{% endif %}
 """
     # FIXME: refactor with two macros: make sums and dump vegalite with color theme configurable
     run_charts = """
@@ -1047,6 +2407,91 @@ endif::[]
 ....
 |=====
 
+[.text-center]
+*Tasks timeline* (seconds from playbook start)
+ifdef::hide-run-link[]
+link:./charts{relfilesuffix}[🔍]
+endif::[]
+[.text-center]
+[vegalite,format="svg",subs="attributes",width=100%]
+....
+{
+  "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+  "background": null,
+  "data": {
+    "values": {{ timeline | default([]) | to_json }}
+  },
+  "mark": {"type": "bar", "tooltip": true},
+  "encoding": {
+    "y": {"field": "task", "type": "nominal", "sort": null, "title": null, "axis": {"labelColor": "{caradoc_label_color}", "labelLimit": 400}},
+    "x": {"field": "start", "type": "quantitative", "title": null, "axis": {"labelColor": "{caradoc_label_color}"}},
+    "x2": {"field": "end"},
+    "color": {
+      "scale": {"scheme": "accent"},
+      "field": "play",
+      "type": "nominal",
+      "legend": {"labelColor": "{caradoc_label_color}", "titleColor": "{caradoc_label_color}", "titleFontSize": 14, "labelFontSize": 12, "labelLimit": 1000}
+    }
+  }
+}
+....
+
+[.text-center]
+*Hosts in flight*
+ifdef::hide-run-link[]
+link:./charts{relfilesuffix}[🔍]
+endif::[]
+[.text-center]
+[vegalite,format="svg",subs="attributes",width=100%]
+....
+{
+  "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+  "background": null,
+  "data": {
+    "values": {{ flight | default([]) | to_json }}
+  },
+  "mark": {"type": "area", "interpolate": "step-after", "tooltip": true},
+  "encoding": {
+    "x": {"field": "t", "type": "quantitative", "title": "seconds from playbook start", "axis": {"labelColor": "{caradoc_label_color}", "titleColor": "{caradoc_label_color}"}},
+    "y": {"field": "in_flight", "type": "quantitative", "title": "hosts", "axis": {"labelColor": "{caradoc_label_color}", "titleColor": "{caradoc_label_color}"}},
+    "color": {
+      "scale": {"scheme": "accent"},
+      "field": "play",
+      "type": "nominal",
+      "legend": {"labelColor": "{caradoc_label_color}", "titleColor": "{caradoc_label_color}", "titleFontSize": 14, "labelFontSize": 12, "labelLimit": 1000}
+    }
+  }
+}
+....
+
+[.text-center]
+*Results per second*
+ifdef::hide-run-link[]
+link:./charts{relfilesuffix}[🔍]
+endif::[]
+[.text-center]
+[vegalite,format="svg",subs="attributes",width=100%]
+....
+{
+  "$schema": "https://vega.github.io/schema/vega-lite/v5.json",
+  "background": null,
+  "data": {
+    "values": {{ flight | default([]) | to_json }}
+  },
+  "mark": {"type": "area", "interpolate": "step-after", "tooltip": true},
+  "encoding": {
+    "x": {"field": "t", "type": "quantitative", "title": "seconds from playbook start", "axis": {"labelColor": "{caradoc_label_color}", "titleColor": "{caradoc_label_color}"}},
+    "y": {"field": "results_per_second", "type": "quantitative", "title": "results/s", "axis": {"labelColor": "{caradoc_label_color}", "titleColor": "{caradoc_label_color}"}},
+    "color": {
+      "scale": {"scheme": "accent"},
+      "field": "play",
+      "type": "nominal",
+      "legend": {"labelColor": "{caradoc_label_color}", "titleColor": "{caradoc_label_color}", "titleFontSize": 14, "labelFontSize": 12, "labelLimit": 1000}
+    }
+  }
+}
+....
+
 """
 
     # Mainlys tricks for kroki and vscode
@@ -1089,3 +2534,467 @@ endif::[]
 +++ <style> #header, #content, #footer, #footnotes { max-width: none;} .emoji_table td:nth-child(1n+3), .emoji_table th:nth-child(1n+3) { text-align: center; padding-left: 2px; padding-right: 2px; } </style> +++
 +++ <style> .run_indicator { font-size: 1.5em; text-align: center; } table.no-border, table.no-border > tbody > th, table.no-border > tbody > tr > td, table.no-border > tbody > tr { border-collapse: collapse !important; border: none !important; }</style>+++
 """
+
+
+# Read only view of the status counters of one row of a counters array, a mapping as templates expect
+class CaradocCounters(Mapping):
+    __slots__ = ("_counters", "_offset")
+
+    def __init__(self, counters, offset=0):
+        self._counters = counters
+        self._offset = offset
+
+    def __getitem__(self, status):
+        return self._counters[self._offset + CARADOC_STATUS_IDS[status]]
+
+    def __iter__(self):
+        return iter(CARADOC_SHOWN_STATUSES)
+
+    def __len__(self):
+        return len(CARADOC_SHOWN_STATUSES)
+
+
+# Status counters of hosts in a single integer array, one row per host after a first "all" row.
+#  Mapping of host to CaradocCounters
+class CaradocHostCounters(Mapping):
+    __slots__ = ("_rows", "_counters")
+
+    def __init__(self):
+        self._rows = {"all": 0}
+        self._counters = array("q", CARADOC_ZERO_COUNTERS)
+
+    def add(self, host, status):
+        row = self._rows.get(host)
+        if row is None:
+            row = self._rows[host] = len(self._rows)
+            self._counters.extend(CARADOC_ZERO_COUNTERS)
+        index = CARADOC_STATUS_IDS[status]
+        self._counters[index] = self._counters[index] + 1
+        index = row * len(CARADOC_STATUSES) + index
+        self._counters[index] = self._counters[index] + 1
+
+    def has_results(self):
+        return any(self._counters[: len(CARADOC_STATUSES)])
+
+    def __getitem__(self, host):
+        return CaradocCounters(self._counters, self._rows[host] * len(CARADOC_STATUSES))
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+
+# Hosts in flight and completed results of a play, per bucket of CARADOC_SERIES_BUCKET seconds
+#  from playbook start. Hosts in flight of a bucket is the highest count seen during the bucket
+class CaradocSeries:
+    __slots__ = ("play", "first", "in_flight", "peaks", "completed")
+
+    def __init__(self, play, t):
+        self.play = play
+        self.first = int(t // CARADOC_SERIES_BUCKET)
+        self.in_flight = 0
+        self.peaks = array("q")
+        self.completed = array("q")
+
+    def _bucket(self, t):
+        index = max(int(t // CARADOC_SERIES_BUCKET) - self.first, 0)
+        while len(self.peaks) <= index:
+            self.peaks.append(self.in_flight)
+            self.completed.append(0)
+        return index
+
+    def host_start(self, t):
+        index = self._bucket(t)
+        self.in_flight = self.in_flight + 1
+        self.peaks[index] = max(self.peaks[index], self.in_flight)
+
+    def host_end(self, t, started):
+        index = self._bucket(t)
+        self.completed[index] = self.completed[index] + 1
+        if started:
+            self.in_flight = self.in_flight - 1
+
+    # Chart points of all plays, consecutive buckets are merged so there are at most CARADOC_SERIES_POINTS
+    @staticmethod
+    def points(series):
+        series = list(series)
+        count = sum(len(x.peaks) for x in series)
+        merge = max(-(-count // CARADOC_SERIES_POINTS), 1)
+        width = merge * CARADOC_SERIES_BUCKET
+        points = []
+        for x in series:
+            for index in range(0, len(x.peaks), merge):
+                points.append(
+                    {
+                        "play": x.play,
+                        "t": round((x.first + index) * CARADOC_SERIES_BUCKET, 3),
+                        "in_flight": max(x.peaks[index:index + merge]),
+                        "results_per_second": round(sum(x.completed[index:index + merge]) / width, 3),
+                    }
+                )
+        return points
+
+
+# Result counters of a run: per host for the run and each play, and per task
+class CaradocStats:
+    def __init__(self):
+        self.run = CaradocHostCounters()
+        self.plays = {}
+        self.tasks = {}
+
+    def play(self, play_uuid):
+        if play_uuid not in self.plays:
+            self.plays[play_uuid] = CaradocHostCounters()
+        return self.plays[play_uuid]
+
+    def task(self, task_uuid):
+        if task_uuid not in self.tasks:
+            self.tasks[task_uuid] = array("q", CARADOC_ZERO_COUNTERS)
+        return CaradocCounters(self.tasks[task_uuid])
+
+    def add(self, play_uuid, task_uuid, host, status):
+        self.run.add(host, status)
+        self.play(play_uuid).add(host, status)
+        counters = self.tasks[task_uuid]
+        index = CARADOC_STATUS_IDS[status]
+        counters[index] = counters[index] + 1
+
+
+# Wall and CPU time of callback methods, template renders by cache name and file writes.
+#  Methods are wrapped on the instance, Ansible then calls the wrappers
+class CaradocProfiler:
+    def __init__(self):
+        self.hooks = {}
+        self.renders = {}
+        self.files = {}
+        self._lock = threading.Lock()
+
+    def instrument(self, callback):
+        for name in dir(type(callback)):
+            if name.startswith("v2_") and callable(getattr(callback, name)):
+                setattr(callback, name, self._wrap(self.hooks, lambda args, name=name: name, getattr(callback, name)))
+        # renders are keyed by template cache name, 4th argument of _template
+        callback._template = self._wrap(self.renders, lambda args: args[3], callback._template)
+        callback._save_as_file = self._wrap(self.files, lambda args: "files", callback._save_as_file)
+        # host results stored in SQLite are file writes too, commits included
+        if callback._results is not None:
+            callback._results.save = self._wrap(self.files, lambda args: "files", callback._results.save)
+            callback._results.close = self._wrap(self.files, lambda args: "files", callback._results.close)
+
+    def _wrap(self, table, key, func):
+        def measured(*args, **kwargs):
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+                name = key(args)
+                # renders and writes may run in the writer thread
+                with self._lock:
+                    measure = table.setdefault(name, {"calls": 0, "wall": 0.0, "cpu": 0.0})
+                    measure["calls"] = measure["calls"] + 1
+                    measure["wall"] = measure["wall"] + wall
+                    measure["cpu"] = measure["cpu"] + cpu
+
+        return measured
+
+    def report(self):
+        with self._lock:
+            return copy.deepcopy(
+                {"hooks": self.hooks, "renders": self.renders, "files": self.files.get("files", {})}
+            )
+
+    # Rows of the run README summary, slowest first in each group
+    def rows(self):
+        rows = []
+        with self._lock:
+            for prefix, table in (("", self.hooks), ("render ", self.renders), ("write ", self.files)):
+                for name, measure in sorted(table.items(), key=lambda x: x[1]["wall"], reverse=True):
+                    rows.append(
+                        {
+                            "name": f"{prefix}{name}",
+                            "calls": measure["calls"],
+                            "wall": f"{measure['wall']:.3f}",
+                            "cpu": f"{measure['cpu']:.3f}",
+                        }
+                    )
+        return rows
+
+
+# Callback calls with their arguments and time, one JSON line per call in a gzip file.
+#  Ansible objects are reduced to what the callback reads, tasks are recorded in full on first use only
+class CaradocTrace:
+    FILENAME = "trace.jsonl.gz"
+
+    # Arguments of each traced call, calls not listed here are not traced
+    ARGS = {
+        "v2_playbook_on_start": (),
+        "v2_playbook_on_play_start": ("play",),
+        "v2_playbook_on_task_start": ("task", "value"),
+        "v2_playbook_on_handler_task_start": ("task",),
+        "v2_playbook_on_notify": ("task", "host"),
+        "v2_playbook_on_include": (),
+        "v2_playbook_on_stats": (),
+        "v2_runner_on_start": ("host", "task"),
+        "v2_on_file_diff": ("diff",),
+        "v2_runner_on_ok": ("result",),
+        "v2_runner_on_failed": ("result",),
+        "v2_runner_on_skipped": ("result",),
+        "v2_runner_on_unreachable": ("result",),
+        "v2_runner_item_on_ok": ("result",),
+        "v2_runner_item_on_failed": ("result",),
+        "v2_runner_item_on_skipped": ("result",),
+        "v2_runner_retry": ("result",),
+        "v2_runner_on_async_ok": ("result",),
+        "v2_runner_on_async_failed": ("result",),
+        "v2_runner_on_async_poll": ("result",),
+    }
+
+    def __init__(self, path, started_at):
+        self._fd = gzip.open(path, "wt", encoding="utf-8")
+        self._started_at = started_at
+        self._tasks = set()
+
+    def instrument(self, callback):
+        for name in self.ARGS:
+            if callable(getattr(callback, name, None)):
+                setattr(callback, name, self._wrap(name, getattr(callback, name)))
+
+    def _wrap(self, name, func):
+        def traced(*args, **kwargs):
+            self.record(name, args, kwargs)
+            return func(*args, **kwargs)
+
+        return traced
+
+    def record(self, name, args, kwargs):
+        kinds = self.ARGS[name]
+        call = {
+            "m": name,
+            "t": round(time.monotonic() - self._started_at, 3),
+            "a": [getattr(self, f"_{kind}")(arg) for kind, arg in zip(kinds, args)],
+        }
+        kwargs = {k: v for k, v in kwargs.items() if isinstance(v, (bool, int, str))}
+        if kwargs:
+            call["k"] = kwargs
+        self._fd.write(json.dumps(call, separators=(",", ":"), ensure_ascii=False, default=to_text))
+        self._fd.write("\n")
+
+    @staticmethod
+    def _play(play):
+        return {"uuid": play._uuid, "name": play.name, "hosts": play.hosts}
+
+    def _task(self, task):
+        if task._uuid in self._tasks:
+            return {"uuid": task._uuid}
+        self._tasks.add(task._uuid)
+        return {
+            "uuid": task._uuid,
+            "name": task.get_name(),
+            "action": task.action,
+            "tags": task.tags,
+            "path": task.get_path(),
+            "loop": bool(task.loop),
+            "rescue": CallbackModule._has_rescue(task),
+        }
+
+    @staticmethod
+    def _host(host):
+        return host.name
+
+    @staticmethod
+    def _value(value):
+        return value
+
+    def _result(self, result):
+        return {"host": result._host.name, "task": self._task(result._task), "result": result._result}
+
+    # Result is sent again once diff is handled, only keys read for the diff are kept
+    def _diff(self, result):
+        keys = ("changed", "diff")
+        diff = {k: result._result[k] for k in keys if k in result._result}
+        if "results" in result._result:
+            diff["results"] = [{k: r[k] for k in keys if k in r} for r in result._result["results"]]
+        return {"host": result._host.name, "task": self._task(result._task), "result": diff}
+
+    def close(self):
+        self._fd.close()
+
+
+# Append only log of callback events as JSON lines. Writes are buffered, a background thread flushes
+#  the buffer every FLUSH_INTERVAL seconds when events were recorded, so a killed run loses at most
+#  the events of its last FLUSH_INTERVAL seconds
+class CaradocEventLog:
+    FILENAME = "events.jsonl"
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, path):
+        self._fd = open(path, "a", buffering=CARADOC_WRITE_BUFFER_SIZE, encoding="utf-8")
+        self._lock = threading.Lock()
+        self._pending = False
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="caradoc-events", daemon=True)
+        self._thread.start()
+
+    def record(self, event):
+        line = json.dumps(event, separators=(",", ":"), ensure_ascii=False, default=to_text)
+        with self._lock:
+            self._fd.write(line)
+            self._fd.write("\n")
+            self._pending = True
+
+    def _run(self):
+        while not self._closed.wait(self.FLUSH_INTERVAL):
+            with self._lock:
+                if self._pending:
+                    self._fd.flush()
+                    self._pending = False
+
+    def close(self, fsync=False):
+        self._closed.set()
+        self._thread.join()
+        self._fd.flush()
+        if fsync:
+            os.fsync(self._fd.fileno())
+        self._fd.close()
+
+
+# Host results of a run in a single SQLite file, rather than one file per task and host.
+#  Content is zlib compressed, rows are committed by batches. Default rollback journal is kept:
+#  WAL needs shared memory between readers and writer, which is not safe on network filesystems
+class CaradocResultStore:
+    FILENAME = "results.sqlite"
+    COMMIT_EVERY = 256
+
+    def __init__(self, run_folder, synchronous="NORMAL"):
+        self._db = sqlite3.connect(
+            os.path.join(run_folder, self.FILENAME), check_same_thread=False
+        )
+        self._db.execute(f"PRAGMA synchronous={synchronous}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(path TEXT PRIMARY KEY, gzip INTEGER NOT NULL, size INTEGER NOT NULL, data BLOB NOT NULL)"
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    # Store bytes blocks as the file at path (relative to run folder), gzip tells to export it compressed.
+    #  Returns uncompressed size
+    def save(self, path, blocks, compress=False):
+        compressor = zlib.compressobj()
+        data, size = [], 0
+        for block in blocks:
+            size = size + len(block)
+            data.append(compressor.compress(block))
+        data.append(compressor.flush())
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (path, int(compress), size, b"".join(data)),
+            )
+            self._pending = self._pending + 1
+            if self._pending >= self.COMMIT_EVERY:
+                self._db.commit()
+                self._pending = 0
+        return size
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+
+# Write host results stored in results.sqlite of a run folder back as classic files. Returns files count
+def caradoc_export(run_folder):
+    db = sqlite3.connect(os.path.join(run_folder, CaradocResultStore.FILENAME))
+    count = 0
+    try:
+        for path, compress, data in db.execute("SELECT path, gzip, data FROM results"):
+            target = os.path.join(run_folder, path)
+            makedirs_safe(os.path.dirname(target))
+            content = zlib.decompress(data)
+            with open(target, "wb") as raw, (
+                gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+                if compress
+                else contextlib.nullcontext(raw)
+            ) as fd:
+                fd.write(content)
+            count = count + 1
+    finally:
+        db.close()
+    return count
+
+
+# Callback of a render worker process, inherited from the render command process
+_CARADOC_RENDER_CALLBACK = None
+
+
+def _caradoc_render_init(callback):
+    global _CARADOC_RENDER_CALLBACK
+    _CARADOC_RENDER_CALLBACK = callback
+
+
+def _caradoc_render_play(play, tasks, host_results):
+    callback = _CARADOC_RENDER_CALLBACK
+    callback.play = play
+    callback.tasks = tasks
+    callback.play_results["plays"][play["_uuid"]] = {"host_results": host_results}
+    callback._render_play_pages()
+
+
+# Render pages of a run folder. The plugin is loaded by Ansible so options are read as for a playbook run,
+#  from environment and ansible.cfg
+def caradoc_render(run_folder, workers=1):
+    from ansible.parsing.dataloader import DataLoader
+    from ansible.plugins.loader import callback_loader
+
+    callback_loader.add_directory(os.path.dirname(os.path.abspath(__file__)))
+    callback = callback_loader.get(os.path.splitext(os.path.basename(__file__))[0])
+    callback.set_options()
+    return callback.render(run_folder, DataLoader(), workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="caradoc.py", description="Caradoc offline tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser(
+        "export", help="write host results of a run stored in results.sqlite as files"
+    )
+    export.add_argument("run_folder", help="run folder, like .caradoc/20230101-120000")
+    render = commands.add_parser(
+        "render", help="render all pages of a run from its event log"
+    )
+    render.add_argument("run_folder", help="run folder, like .caradoc/20230101-120000")
+    render.add_argument(
+        "-w", "--workers", type=int, default=1, help="number of processes rendering plays"
+    )
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        count = caradoc_export(args.run_folder)
+        print(f"{count} files written to {args.run_folder}")
+    elif args.command == "render":
+        timings = caradoc_render(args.run_folder, args.workers)
+        print(
+            f"pages of {args.run_folder} rendered: "
+            + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in timings.items())
+        )
+
+
+# Register built-in templates once, renders then only need a dict lookup
+for _name in (
+    "task",
+    "playbook",
+    "playbook_task_rows",
+    "playbook_charts",
+    "run",
+    "run_charts",
+):
+    caradoc_template_source(getattr(CaradocTemplates, _name), _name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Copyright (c) 2022 The Caradoc Callback Record Ansible Asciidoc authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Shared helpers for Caradoc benchmarks, run them from the repository root
+
+import importlib.util
+import os
+import resource
+import time
+
+PLUGIN_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "plugins", "callback", "caradoc.py"
+)
+
+
+# Import the callback plugin file as a module, without going through Ansible plugin loader
+def load_caradoc():
+    spec = importlib.util.spec_from_file_location("caradoc", PLUGIN_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# Run func count times, returns mean seconds per call
+def timed(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+# Load the callback through Ansible plugin loader, so that options are read from CARADOC_* environment
+def load_callback():
+    from ansible.plugins.loader import callback_loader
+
+    callback_loader.add_directory(os.path.dirname(PLUGIN_PATH))
+    callback = callback_loader.get("caradoc")
+    callback.set_options()
+    return callback
+
+
+# Peak resident memory of this process, in KiB
+def peak_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Minimal stand-ins for the Ansible objects the callback reads
+class FakePlaybook:
+    def __init__(self, loader):
+        self._loader = loader
+
+    def get_loader(self):
+        return self._loader
+
+
+class FakePlay:
+    def __init__(self, uuid, name, hosts):
+        self._uuid = uuid
+        self.name = name
+        self.hosts = hosts
+
+
+# Block holding a task, the callback only checks for a rescue section
+class FakeBlock:
+    def __init__(self, rescue=False):
+        self._ds = {"rescue": []} if rescue else {}
+
+
+class FakeTask:
+    def __init__(self, uuid, name, action="command", tags=None, path="synthetic.yml:1", loop=None, rescue=False):
+        self._uuid = uuid
+        self._name = name
+        self.action = action
+        self.tags = tags or []
+        self._path = path
+        self._parent = FakeBlock(rescue)
+        self.loop = loop
+
+    def get_name(self):
+        return self._name
+
+    def get_path(self):
+        return self._path
+
+
+class FakeHost:
+    def __init__(self, name):
+        self.name = name
+
+    def get_name(self):
+        return self.name
+
+
+class FakeResult:
+    def __init__(self, host, task, result):
+        self._host = host
+        self._task = task
+        self._result = result
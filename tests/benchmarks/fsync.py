@@ -0,0 +1,87 @@
+# Copyright (c) 2022 The Caradoc Callback Record Ansible Asciidoc authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Check fsync=stats with relative and absolute log folders: run a small synthetic playbook, then
+#  check that every flushed path exists and stays under the parent of the log folder, sibling folders included.
+#  Fails on the first wrong flush or if the run raises.
+#   python tests/benchmarks/fsync.py
+
+import os
+import shutil
+import sys
+import tempfile
+
+from ansible.parsing.dataloader import DataLoader
+
+from caradoc_bench import FakeHost, FakePlay, FakePlaybook, FakeResult, FakeTask, load_callback
+
+# Log folders relative to the work folder, a sibling of the last one is created to be left alone
+LOG_FOLDERS = [".", "./", "out", "./out/", os.path.join("..", "out")]
+
+
+def run_playbook(callback):
+    hosts = [FakeHost(f"host{i}") for i in range(3)]
+    callback.v2_playbook_on_start(FakePlaybook(DataLoader()))
+    callback.v2_playbook_on_play_start(FakePlay("play-0", "fsync", ["all"]))
+    for task_index in range(2):
+        task = FakeTask(f"task-{task_index}", f"fsync task {task_index}")
+        callback.v2_playbook_on_task_start(task, False)
+        for host in hosts:
+            callback.v2_runner_on_start(host, task)
+            callback.v2_runner_on_ok(FakeResult(host, task, {"changed": False, "msg": "ok"}))
+    callback.v2_playbook_on_stats(None)
+
+
+# Flushed paths of a run in work_folder with the given log folder
+def flushed_paths(work_folder, log_folder):
+    os.environ["ANSIBLE_LOG_FOLDER"] = log_folder
+    os.environ["CARADOC_FSYNC"] = "stats"
+    flushed = []
+    callback = load_callback()
+    fsync_path = callback._fsync_path
+
+    def record(path):
+        flushed.append(path)
+        fsync_path(path)
+
+    callback._fsync_path = record
+    cwd = os.getcwd()
+    os.chdir(work_folder)
+    try:
+        run_playbook(callback)
+        return [os.path.abspath(path) if path else path for path in flushed]
+    finally:
+        os.chdir(cwd)
+
+
+def main():
+    errors = 0
+    for log_folder in LOG_FOLDERS:
+        root = tempfile.mkdtemp(prefix="caradoc-fsync-")
+        work_folder = os.path.join(root, "work")
+        os.makedirs(work_folder)
+        base_folder = os.path.dirname(os.path.abspath(os.path.join(work_folder, log_folder)))
+        sibling = os.path.abspath(os.path.join(work_folder, log_folder)).rstrip(os.sep) + "2"
+        os.makedirs(sibling, exist_ok=True)
+        try:
+            flushed = flushed_paths(work_folder, log_folder)
+            wrong = [
+                path for path in flushed
+                if not path or not os.path.exists(path)
+                or os.path.commonpath([path, base_folder]) != base_folder
+                or os.path.commonpath([path, sibling]) == sibling
+            ]
+        except Exception as e:  # pylint: disable=broad-except
+            flushed, wrong = [], [repr(e)]
+        finally:
+            shutil.rmtree(root)
+        print(f"{log_folder!r:16} {len(flushed):4} flushed paths{'  WRONG ' + ', '.join(wrong) if wrong else ''}")
+        errors = errors + bool(wrong) + (not flushed)
+    if errors:
+        print(f"{errors} log folders flushed wrong paths")
+        sys.exit(1)
+    print("all flushed paths are under the log folder parent")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Copyright (c) 2022 The Caradoc Callback Record Ansible Asciidoc authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Compare jinja and native renderers on the per result hot path: task README and run README.
+#  Fails if both renderers do not produce the exact same output.
+#   python tests/benchmarks/renderer.py --results 500 --hosts 50
+
+import argparse
+import random
+import sys
+import time
+
+from ansible.parsing.dataloader import DataLoader
+from ansible.utils.unsafe_proxy import wrap_var
+
+from caradoc_bench import load_caradoc
+
+STATUSES = ["ok", "changed", "failed", "ignored_failed", "skipped", "rescued"]
+
+
+def run_state(plays, tasks, hosts):
+    struct = {status: random.randint(0, 9) for status in STATUSES}
+    play_results = {"plays": {}, "host_results": {"all": dict(struct)}}
+    for host in range(hosts):
+        play_results["host_results"][f"host{host}"] = dict(struct)
+    for play in range(plays):
+        play_results["plays"][f"play-{play}"] = {
+            "host_results": {"all": dict(struct)},
+            "name": f"Play {play} with a | and a !",
+            "filename": f"Play_{play}",
+        }
+    latest_tasks = {
+        f"task-{task}": {
+            "task_uuid": f"task-{task}",
+            "task_name": wrap_var("" if task == 0 else f"Task {{{{ jinja }}}} {task}"),
+            "play_name": "Play | 0",
+            "play_filename": "Play_0",
+            "all_results": {status: random.randint(0, 3) for status in STATUSES},
+            "task_filename": f"Task_{task}-debug",
+        }
+        for task in range(tasks)
+    }
+    slowest_tasks = [
+        dict(latest_tasks[f"task-{task}"], duration=f"{10.0 / (task + 1):.2f}s")
+        for task in range(min(tasks, 10))
+    ]
+    slowest_hosts = [{"host": f"host{host} |!", "duration": f"{host / 3:.2f}s"} for host in range(min(hosts, 10))]
+    return {
+        "play_results": play_results,
+        "tasks": {},
+        "latest_tasks": latest_tasks,
+        "run_date": "2024/01/01 - 00:00:00",
+        "slowest_tasks": slowest_tasks,
+        "slowest_hosts": slowest_hosts,
+        "profile": [{"name": f"render {name}", "calls": 3, "wall": "0.010", "cpu": "0.005"} for name in ("tasks", "run")],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--results", type=int, default=500)
+    parser.add_argument("--hosts", type=int, default=50)
+    args = parser.parse_args()
+
+    caradoc = load_caradoc()
+    loader = DataLoader()
+    templates = caradoc.CaradocTemplates
+    random.seed(0)
+
+    run_vars = run_state(plays=5, tasks=20, hosts=args.hosts)
+    task = {
+        "_uuid": "bench",
+        "task_name": wrap_var("bench {{ task }}"),
+        "base_path": "plays/bench/bench-debug",
+        "filename": "bench-debug",
+        "tags": ["a"],
+        "action": "debug",
+        "path": "bench.yml:1",
+        "results": {},
+        "has_rescue": False,
+    }
+
+    timings = {}
+    outputs = {}
+    for renderer in ("jinja", "native"):
+        callback = caradoc.CallbackModule()
+        callback.renderer = renderer
+        task["results"] = {}
+        rendered = []
+        start = time.perf_counter()
+        for index in range(args.results):
+            host = f"Host{index % args.hosts}" if index % 2 else f"host{index % args.hosts}"
+            status = STATUSES[index % len(STATUSES)]
+            task["results"][host] = {"status": status}
+            if index % 5 == 0:
+                task["results"][host]["diff"] = wrap_var(f"--- before\n+++ after\n@@ {index} @@")
+            elif index % 5 == 1:
+                task["results"][host]["diff_file"] = f"{host}.diff"
+            if index % 7 == 0:
+                task["results"][host]["blobs"] = [f"{host}.stdout.gz", f"{host}.stdout_lines.gz"]
+            task_vars = {"env_rel_path": "../../../..", "task": task, "play_name": "bench"}
+            rendered.append(callback._template(loader, templates.task, task_vars, "tasks"))
+            rendered.append(callback._template(loader, templates.run, dict(run_vars), "run"))
+        timings[renderer] = time.perf_counter() - start
+        outputs[renderer] = rendered
+
+    # waiting state of an empty task
+    task["results"] = {}
+    for renderer in ("jinja", "native"):
+        callback = caradoc.CallbackModule()
+        callback.renderer = renderer
+        task_vars = {"env_rel_path": "../../../..", "task": task, "play_name": "bench"}
+        outputs[renderer].append(callback._template(loader, templates.task, task_vars, "tasks"))
+
+    mismatches = [i for i, (a, b) in enumerate(zip(outputs["jinja"], outputs["native"])) if a != b]
+    for renderer, elapsed in timings.items():
+        print(f"{renderer:7} {args.results / elapsed:10.1f} results/s  ({elapsed:.2f}s)")
+    print(f"speedup: {timings['jinja'] / timings['native']:.1f}x")
+    if mismatches:
+        print(f"{len(mismatches)} renders differ, first at index {mismatches[0]}")
+        sys.exit(1)
+    print("outputs are identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Copyright (c) 2022 The Caradoc Callback Record Ansible Asciidoc authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Feed a trace recorded with CARADOC_TRACE=true back to CallbackModule, without running Ansible.
+#  Calls are sent at full speed by default, or at recorded pace divided by --speed.
+#  Reports replay time against recorded time, results/s, peak RSS, files and bytes written.
+#   python tests/benchmarks/replay.py .caradoc/[run folder]/trace.jsonl.gz
+#   python tests/benchmarks/replay.py trace.jsonl.gz --speed 60 -o renderer=native -o profile=true
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+
+from ansible.parsing.dataloader import DataLoader
+
+from caradoc_bench import FakeHost, FakePlay, FakePlaybook, FakeResult, FakeTask, load_callback, peak_rss
+
+
+# Calls of a trace, a trace cut by a killed run ends at its last complete line
+def read_trace(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+        except (EOFError, zlib.error):
+            print(f"{path} is truncated, replaying complete calls only")
+
+
+# Rebuilds the Ansible objects of a call, tasks and hosts are shared between calls as in Ansible
+class Decoder:
+    def __init__(self, kinds):
+        self.kinds = kinds
+        self.tasks = {}
+        self.hosts = {}
+
+    def play(self, play):
+        return FakePlay(play["uuid"], play["name"], play["hosts"])
+
+    def task(self, task):
+        if task["uuid"] not in self.tasks:
+            self.tasks[task["uuid"]] = FakeTask(
+                task["uuid"],
+                task.get("name"),
+                task.get("action"),
+                task.get("tags"),
+                task.get("path"),
+                task.get("loop"),
+                task.get("rescue", False),
+            )
+        return self.tasks[task["uuid"]]
+
+    def host(self, name):
+        if name not in self.hosts:
+            self.hosts[name] = FakeHost(name)
+        return self.hosts[name]
+
+    def value(self, value):
+        return value
+
+    def result(self, result):
+        return FakeResult(self.host(result["host"]), self.task(result["task"]), result["result"])
+
+    diff = result
+
+    # Calls with arguments not recorded, the callback does not read them
+    def args(self, call):
+        if call["m"] == "v2_playbook_on_start":
+            return [FakePlaybook(DataLoader())]
+        if call["m"] in ("v2_playbook_on_stats", "v2_playbook_on_include"):
+            return [None]
+        kinds = self.kinds[call["m"]]
+        return [getattr(self, kind)(arg) for kind, arg in zip(kinds, call["a"])]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type=float, default=0, help="recorded pace multiplier, 0 for full speed")
+    parser.add_argument("-o", "--option", action="append", default=[], help="caradoc option as name=value")
+    parser.add_argument("--keep", action="store_true", help="keep the written run folder")
+    args = parser.parse_args()
+
+    log_folder = tempfile.mkdtemp(prefix="caradoc-replay-")
+    os.environ["ANSIBLE_LOG_FOLDER"] = log_folder
+    for option in args.option:
+        name, value = option.split("=", 1)
+        os.environ[f"CARADOC_{name.upper()}"] = value
+
+    callback = load_callback()
+    decoder = Decoder(sys.modules[type(callback).__module__].CaradocTrace.ARGS)
+    calls, results, recorded = 0, 0, 0.0
+    start = time.perf_counter()
+    for call in read_trace(args.trace):
+        if args.speed:
+            delay = call["t"] / args.speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        getattr(callback, call["m"])(*decoder.args(call), **call.get("k", {}))
+        calls = calls + 1
+        results = results + (call["m"].startswith("v2_runner_on_") and call["m"] != "v2_runner_on_start")
+        recorded = call["t"]
+    elapsed = time.perf_counter() - start
+
+    if args.keep:
+        print(f"run folder kept in {log_folder}")
+    else:
+        shutil.rmtree(log_folder)
+    print(f"{calls} calls recorded in {recorded:.1f}s, replayed in {elapsed:.2f}s ({recorded / elapsed:.1f}x)")
+    print(f"results/s       {results / elapsed:14.1f}")
+    print(f"peak_rss_kib    {peak_rss():14.1f}")
+    print(f"written_files   {callback.write_stats['written_files']:14.1f}")
+    print(f"written_bytes   {callback.write_stats['written_bytes']:14.1f}")
+
+
+if __name__ == "__main__":
+    main()
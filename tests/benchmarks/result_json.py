@@ -0,0 +1,96 @@
+# Copyright (c) 2022 The Caradoc Callback Record Ansible Asciidoc authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Host result JSON serialization: former deepcopy + strip_internal_keys + wrap_var + to_nice_json
+#  path against CaradocJSONEncoder, joined as a string or streamed to a file by the callback.
+#  Fails if outputs differ, reports time and peak memory.
+#   python tests/benchmarks/result_json.py --facts 2000 --stdout-lines 50000
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ansible.plugins.filter.core import to_nice_json
+from ansible.utils.unsafe_proxy import wrap_var
+from ansible.vars.clean import module_response_deepcopy, strip_internal_keys
+
+from caradoc_bench import load_caradoc
+
+
+# Looks like a setup or command result, with internal keys at several levels
+def large_result(facts, stdout_lines):
+    return {
+        "changed": False,
+        "_ansible_no_log": False,
+        "_ansible_verbose_override": True,
+        "ansible_facts": {
+            f"fact_{i}": {"value": f"é {i}", "list": [i, i / 3, None, True], "_ansible_x": 1}
+            for i in range(facts)
+        },
+        "stdout": "\n".join(f"line {i}" for i in range(stdout_lines)),
+        "stdout_lines": [f"line {i}" for i in range(stdout_lines)],
+        "results": [{"item": i, "_ansible_item_label": i, "rc": 0} for i in range(10)],
+        "tuple": (1, {"_ansible_kept": "strip_internal_keys does not walk tuples"}),
+        "date": datetime.date(2024, 1, 1),
+        "floats": [float("nan"), float("inf"), -0.0, 1e300],
+        "int_keys": {2: "two", 1: "one"},
+        "float_keys": {2.5: "b", 1.5: "a"},
+        "empty_after_strip": {"_ansible_only": 1},
+        "escape": "quote \" backslash \\ tab \t unicode ☃ \U0001f600",
+    }
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    output = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return output, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--facts", type=int, default=2000)
+    parser.add_argument("--stdout-lines", type=int, default=50000)
+    args = parser.parse_args()
+
+    caradoc = load_caradoc()
+    result = large_result(args.facts, args.stdout_lines)
+
+    def former():
+        return "\n" + to_nice_json(wrap_var(strip_internal_keys(module_response_deepcopy(result))))
+
+    def encoder():
+        return "\n" + "".join(caradoc.CaradocJSONEncoder().iterencode(result))
+
+    log_folder = tempfile.mkdtemp(prefix="caradoc-bench-")
+    callback = caradoc.CallbackModule()
+    callback.log_folder = log_folder
+
+    def streamed():
+        callback._encode_and_save("task", "host.json", result)
+
+    former_output, former_time, former_peak = measure(former)
+    encoder_output, encoder_time, encoder_peak = measure(encoder)
+    _, streamed_time, streamed_peak = measure(streamed)
+    with open(os.path.join(log_folder, "task", "host.json"), encoding="utf-8") as fd:
+        streamed_output = fd.read()
+
+    print(f"output size: {len(encoder_output) / 1e6:.1f} MB")
+    print(f"former:   {former_time:6.2f}s  peak {former_peak / 1e6:8.1f} MB")
+    print(f"encoder:  {encoder_time:6.2f}s  peak {encoder_peak / 1e6:8.1f} MB")
+    print(f"streamed: {streamed_time:6.2f}s  peak {streamed_peak / 1e6:8.1f} MB")
+    if not former_output == encoder_output == streamed_output:
+        print("outputs differ")
+        sys.exit(1)
+    print("outputs are identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# Copyright (c) 2022 The Caradoc Callback Record Ansible Asciidoc authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Drive CallbackModule with a synthetic playbook, without running Ansible: plays x tasks x hosts results
+#  of a given size, diffs and statuses. Reports results/s, peak RSS, files and bytes written, then compares
+#  with the stored baseline of the same scenario. Fails if one measure is worse than tolerance allows.
+#   python tests/benchmarks/synthetic.py --hosts 50 --tasks 20 --result-size 2000 --diff-rate 0.5
+#   python tests/benchmarks/synthetic.py -o renderer=native -o async_mode=true
+#   python tests/benchmarks/synthetic.py --save-baseline
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from ansible.parsing.dataloader import DataLoader
+
+from caradoc_bench import FakeHost, FakePlay, FakePlaybook, FakeResult, FakeTask, load_callback, peak_rss
+
+STATUSES = ["ok", "changed", "failed", "ignored_failed", "skipped", "unreachable"]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Measures where higher is better, others are better lower
+HIGHER_IS_BETTER = {"results_per_s"}
+
+
+# Host result of a command like task, stdout of about size characters
+def host_result(status, size, index):
+    line = f"synthetic output line {index} "
+    lines = [line] * (size // len(line))
+    result = {
+        "changed": status in ("changed", "ignored_failed"),
+        "cmd": ["echo", str(index)],
+        "rc": 1 if status in ("failed", "ignored_failed") else 0,
+        "stdout": "\n".join(lines),
+        "stdout_lines": lines,
+        "stderr": "",
+        "stderr_lines": [],
+        "_ansible_no_log": False,
+    }
+    if status == "skipped":
+        result = {"changed": False, "skipped": True, "skip_reason": "Conditional result was False"}
+    elif status == "unreachable":
+        result = {"unreachable": True, "msg": "Failed to connect to the host via ssh", "changed": False}
+    return result
+
+
+def file_diff(index):
+    return {
+        "before_header": f"/etc/synthetic/{index}.conf",
+        "after_header": f"/etc/synthetic/{index}.conf",
+        "before": "".join(f"key{i} = {i}\n" for i in range(20)),
+        "after": "".join(f"key{i} = {i + index % 3}\n" for i in range(20)),
+    }
+
+
+def send_result(callback, result, status):
+    if status in ("ok", "changed"):
+        callback.v2_runner_on_ok(result)
+    elif status == "failed":
+        callback.v2_runner_on_failed(result)
+    elif status == "ignored_failed":
+        callback.v2_runner_on_failed(result, ignore_errors=True)
+    elif status == "skipped":
+        callback.v2_runner_on_skipped(result)
+    else:
+        callback.v2_runner_on_unreachable(result)
+
+
+# Sends callback calls in Ansible order: task start, host starts, then diff and result of each host
+def run_playbook(callback, args):
+    rng = random.Random(args.seed)
+    hosts = [FakeHost(f"host{i}") for i in range(args.hosts)]
+    callback.v2_playbook_on_start(FakePlaybook(DataLoader()))
+    results = 0
+    for play_index in range(args.plays):
+        callback.v2_playbook_on_play_start(FakePlay(f"play-{play_index}", f"synthetic {play_index}", ["all"]))
+        for task_index in range(args.tasks):
+            task = FakeTask(f"task-{play_index}-{task_index}", f"synthetic task {task_index}", tags=["synthetic"])
+            callback.v2_playbook_on_task_start(task, False)
+            for host in hosts:
+                callback.v2_runner_on_start(host, task)
+            for host in hosts:
+                status = rng.choice(args.statuses)
+                result = FakeResult(host, task, host_result(status, args.result_size, results))
+                if status == "changed" and rng.random() < args.diff_rate:
+                    result._result["diff"] = file_diff(results)
+                    callback.v2_on_file_diff(result)
+                send_result(callback, result, status)
+                results = results + 1
+    callback.v2_playbook_on_stats(None)
+    return results
+
+
+def scenario(args):
+    name = f"{args.plays}x{args.tasks}x{args.hosts}-size{args.result_size}-diff{args.diff_rate}-{'+'.join(args.statuses)}"
+    return "-".join([name] + sorted(args.option))
+
+
+def compare(measures, baseline, tolerance):
+    regressions = []
+    for key, value in measures.items():
+        if key not in baseline or not baseline[key]:
+            continue
+        ratio = value / baseline[key]
+        worse = ratio < 1 - tolerance if key in HIGHER_IS_BETTER else ratio > 1 + tolerance
+        print(f"{key:15} {value:14.1f}  baseline {baseline[key]:14.1f}  {ratio:6.2f}x{'  REGRESSION' if worse else ''}")
+        if worse:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plays", type=int, default=2)
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--result-size", type=int, default=2000, help="stdout characters of each result")
+    parser.add_argument("--diff-rate", type=float, default=0.5, help="part of changed results with a file diff")
+    parser.add_argument("--statuses", type=lambda x: x.split(","), default=STATUSES, help="comma separated, picked at random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--option", action="append", default=[], help="caradoc option as name=value")
+    parser.add_argument("--keep", action="store_true", help="keep the written run folder")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    unknown = set(args.statuses) - set(STATUSES)
+    if unknown:
+        parser.error(f"unknown statuses {', '.join(sorted(unknown))}, choose from {', '.join(STATUSES)}")
+
+    log_folder = tempfile.mkdtemp(prefix="caradoc-bench-")
+    os.environ["ANSIBLE_LOG_FOLDER"] = log_folder
+    for option in args.option:
+        name, value = option.split("=", 1)
+        os.environ[f"CARADOC_{name.upper()}"] = value
+
+    callback = load_callback()
+    start = time.perf_counter()
+    results = run_playbook(callback, args)
+    elapsed = time.perf_counter() - start
+    if args.keep:
+        print(f"run folder kept in {log_folder}")
+    else:
+        shutil.rmtree(log_folder)
+
+    measures = {
+        "results_per_s": results / elapsed,
+        "peak_rss_kib": peak_rss(),
+        "written_files": callback.write_stats["written_files"],
+        "written_bytes": callback.write_stats["written_bytes"],
+    }
+    name = scenario(args)
+    print(f"{name}: {results} results in {elapsed:.2f}s")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    if args.save_baseline:
+        baselines[name] = measures
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    if name not in baselines:
+        for key, value in measures.items():
+            print(f"{key:15} {value:14.1f}")
+        print("no baseline for this scenario, save one with --save-baseline")
+        return
+
+    regressions = compare(measures, baselines[name], args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} measures regressed beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("no regression")
+
+
+if __name__ == "__main__":
+    main()
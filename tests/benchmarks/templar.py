@@ -0,0 +1,58 @@
+# Copyright (c) 2022 The Caradoc Callback Record Ansible Asciidoc authors
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Per render overhead of a new CaradocTemplar for each file vs a single templar for the run
+#   python tests/benchmarks/templar.py --renders 2000 --hosts 20
+
+import argparse
+
+from ansible.parsing.dataloader import DataLoader
+
+from caradoc_bench import load_caradoc, timed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=2000)
+    parser.add_argument("--hosts", type=int, default=20)
+    args = parser.parse_args()
+
+    caradoc = load_caradoc()
+    loader = DataLoader()
+    callback = caradoc.CallbackModule()
+
+    task = {
+        "_uuid": "bench",
+        "task_name": "bench task",
+        "base_path": "plays/bench/bench-debug",
+        "filename": "bench-debug",
+        "tags": [],
+        "action": "debug",
+        "path": "bench.yml:1",
+        "results": {f"host{i}": {"status": "ok"} for i in range(args.hosts)},
+        "has_rescue": False,
+    }
+
+    def render():
+        tpl_vars = {"env_rel_path": "../../../..", "task": task, "play_name": "bench"}
+        callback._template(loader, caradoc.CaradocTemplates.task, tpl_vars, "tasks")
+
+    def render_new_templar():
+        callback._templar = None
+        render()
+
+    # warm up template compile cache
+    render()
+    new_templar = timed(render_new_templar, args.renders)
+    shared_templar = timed(render, args.renders)
+    construct = timed(lambda: caradoc.CaradocTemplar(loader=loader), args.renders)
+
+    print(f"renders: {args.renders}, hosts per task: {args.hosts}")
+    print(f"templar construction:     {construct * 1e6:10.1f} us")
+    print(f"render, new templar:      {new_templar * 1e6:10.1f} us")
+    print(f"render, shared templar:   {shared_templar * 1e6:10.1f} us")
+    print(f"saved per render:         {(new_templar - shared_templar) * 1e6:10.1f} us")
+
+
+if __name__ == "__main__":
+    main()